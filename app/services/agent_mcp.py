@@ -4,8 +4,33 @@ Pure MCP approach with smart caching - works without full AgentCPM complexity
 """
 
 import json
+import re
 import time
+from collections import deque
 from app.services.mcp_tools import CollegeMCPTools
+from app.services.knowledge_base import GREETINGS, any_of  # Shared with the RAG pre-checks
+
+
+# Tool-selection patterns, compiled once at import
+NOTICE_RE = any_of(['latest', 'recent', 'current', 'new', 'notice', 'announcement'])
+PORTAL_RE = any_of(['my result', 'my attendance', 'login', 'student portal', 'dashboard', 'my grade', 'my mark'])
+ROLL_NUMBER_RE = re.compile(r'\b\d{2}[kK]\d{2}[a-zA-Z0-9]+\b')  # e.g. 22k91a05c0
+# These keywords should ALWAYS go to the database, never the scraper
+SQL_RE = any_of([
+    'how many', 'students placed', 'placement rate', 'placement statistics', 
+    'cgpa', 'average', 'top companies', 'recruiters', 'students in',
+    'highest', 'lowest', 'package', 'salary', 'count', 'number of',
+    'total', 'percent', 'database', 'db', 'record'
+])
+PLACEMENT_RE = any_of(['placement', 'placed', 'company', 'companies', 'job'])
+STATS_RE = any_of(['how many', 'statistics', 'rate', 'percentage'])
+
+# Scope validation: only obvious non-college topics (math, science problems)
+NON_COLLEGE_RE = any_of([
+    'formula', 'equation', 'calculate', 'solve', 'math problem',
+    'physics problem', 'chemistry problem', '^2', '=', 'x+y', 
+    'integral', 'derivative', 'theorem', 'proof'
+])
 
 
 class SimplifiedMCPAgent:
@@ -27,6 +52,11 @@ class SimplifiedMCPAgent:
             "query_student_portal": self.tools.query_student_portal
         }
         
+        # One keep-alive HTTP session for Ollama: the health check and every
+        # friendly response reuse its connection
+        import requests
+        self._ollama_session = requests.Session()
+        
         # Check if Ollama is available for LLM formatting
         self.llm_available = self._check_ollama_health()
         
@@ -39,7 +69,7 @@ class SimplifiedMCPAgent:
             self.analytics = None
         
         # Conversation context for follow-up questions
-        self.conversation_history = []  # Last 3 queries
+        self.conversation_history = deque(maxlen=3)  # Last 3 queries (oldest drops off automatically)
         self.last_topic = None  # Track current topic (e.g., "placements", "admissions")
         
         # State management for login flow
@@ -61,9 +91,8 @@ class SimplifiedMCPAgent:
         """Check if Ollama is running and available"""
         print("  Checking Ollama connection...")
         try:
-            import requests
             # Try to connect to Ollama
-            response = requests.get('http://localhost:11434/api/tags', timeout=5)
+            response = self._ollama_session.get('http://localhost:11434/api/tags', timeout=5)
             if response.status_code == 200:
                 print("  ✓ Ollama LLM available (friendly mode enabled)")
                 return True
@@ -93,9 +122,8 @@ class SimplifiedMCPAgent:
         # Use LLM for complex/long responses
         return True
     
-    def _resolve_context(self, query: str) -> str:
+    def _resolve_context(self, query: str, query_lower: str) -> str:
         """Resolve context references and follow-up questions"""
-        query_lower = query.lower()
         
         # Handle follow-up patterns
         follow_up_patterns = {
@@ -127,19 +155,11 @@ class SimplifiedMCPAgent:
         
         return query
     
-    def _is_college_related(self, query: str) -> bool:
-        """Scope validation - only reject obvious non-college topics"""
-        query_lower = query.lower()
-        
-        # Only reject obvious non-college topics (math, science problems)
-        non_college = [
-            'formula', 'equation', 'calculate', 'solve', 'math problem',
-            'physics problem', 'chemistry problem', '^2', '=', 'x+y', 
-            'integral', 'derivative', 'theorem', 'proof'
-        ]
+    def _is_college_related(self, query_lower: str) -> bool:
+        """Scope validation - only reject obvious non-college topics (expects a lowercased query)"""
         
         # Reject if it's clearly a math/science problem
-        if any(kw in query_lower for kw in non_college):
+        if NON_COLLEGE_RE.search(query_lower):
             # But allow if it mentions college
             if 'college' in query_lower or 'tkrcet' in query_lower:
                 return True
@@ -148,40 +168,31 @@ class SimplifiedMCPAgent:
         # Accept everything else (assume college-related)
         return True
     
-    def _select_tool(self, query: str) -> str:
-        """Intelligently select which tool to use"""
-        query_lower = query.lower()
+    def _select_tool(self, query_lower: str) -> str:
+        """Intelligently select which tool to use (expects a lowercased query)"""
         
         # Check for latest/recent information - always scrape fresh
-        if any(kw in query_lower for kw in ['latest', 'recent', 'current', 'new', 'notice', 'announcement']):
+        if NOTICE_RE.search(query_lower):
             return "scrape_latest_notices"
         
         # Check for student portal queries
-        if any(kw in query_lower for kw in ['my result', 'my attendance', 'login', 'student portal', 'dashboard', 'my grade', 'my mark']):
+        if PORTAL_RE.search(query_lower):
             # We need to check if we have credentials
             # This will be handled in the call method
             return "query_student_portal"
             
         # FORCE: If query contains a roll number (e.g., 22k91a05c0), force portal tool
-        import re
-        if re.search(r'\b\d{2}[kK]\d{2}[a-zA-Z0-9]+\b', query_lower) and ('result' in query_lower or 'mark' in query_lower):
+        if ROLL_NUMBER_RE.search(query_lower) and ('result' in query_lower or 'mark' in query_lower):
              return "query_student_portal"
         
         # Check for placement/student database queries (STRICT ROUTING)
-        # These keywords should ALWAYS go to the database, never the scraper
-        sql_keywords = [
-            'how many', 'students placed', 'placement rate', 'placement statistics', 
-            'cgpa', 'average', 'top companies', 'recruiters', 'students in',
-            'highest', 'lowest', 'package', 'salary', 'count', 'number of',
-            'total', 'percent', 'database', 'db', 'record'
-        ]
-        if any(kw in query_lower for kw in sql_keywords):
+        if SQL_RE.search(query_lower):
             return "query_database"
         
         # Check for placement queries - scrape website
-        if any(kw in query_lower for kw in ['placement', 'placed', 'company', 'companies', 'job']):
+        if PLACEMENT_RE.search(query_lower):
             # If asking about numbers/stats, use database
-            if any(kw in query_lower for kw in ['how many', 'statistics', 'rate', 'percentage']):
+            if STATS_RE.search(query_lower):
                 return "query_database"
             # Otherwise scrape website for general placement info
             return "scrape_placements"
@@ -192,10 +203,18 @@ class SimplifiedMCPAgent:
     
     def __call__(self, query: str) -> str:
         """Main entry point"""
+        return "".join(self.stream(query))
+    
+    def stream(self, query: str):
+        """
+        Like __call__, but yields the response in chunks: LLM-formatted
+        answers arrive as Ollama generates them, everything else in one piece
+        """
         query = query.strip()
         
         if not query:
-            return "Please enter a question."
+            yield "Please enter a question."
+            return
         
         # Multi-language support: detect and translate
         user_language = 'english'
@@ -204,31 +223,38 @@ class SimplifiedMCPAgent:
             if user_language != 'english':
                 print(f"  [Language detected: {user_language}, translated query]")
         
+        # Lowercase once; the checks below share it
+        query_lower = query.lower()
+        
         # Greetings
-        greetings = ['hi', 'hello', 'hey', 'how are you', 'how r u', 'how are u', 'whats up', "what's up"]
-        if any(g == query.lower() for g in greetings):
+        if query_lower in GREETINGS:
             response = "Hello! I'm TKRCET College Assistant. How can I help you today? 😊"
             if self.translator and user_language != 'english':
                 response = self.translator.process_response(response, user_language)
-            return response
+            yield response
+            return
         
         # Resolve context for follow-up questions
         original_query = query
-        query = self._resolve_context(query)
+        query = self._resolve_context(query, query_lower)
+        if query is not original_query:
+            query_lower = query.lower()
         
         # Scope validation (only reject obvious non-college topics)
-        if not self._is_college_related(query):
+        if not self._is_college_related(query_lower):
             response = "I'm a TKRCET College Assistant. I can help with college-related questions, but that seems like a math or science problem. Try asking about admissions, courses, facilities, placements, or campus life!"
             if self.translator and user_language != 'english':
                 response = self.translator.process_response(response, user_language)
-            return response
+            yield response
+            return
             
         # --- LOGIN STATE HANDLING ---
         if self.waiting_for_credential:
             # Case 1: Waiting for Roll Number
             if not self.temp_username:
                 self.temp_username = query.strip().upper()
-                return "Thanks! Now please enter your password:"
+                yield "Thanks! Now please enter your password:"
+                return
             
             # Case 2: Waiting for Password (we have username)
             else:
@@ -243,21 +269,21 @@ class SimplifiedMCPAgent:
                 
                 # Trigger the portal query
                 print(f"  [Credentials received. Logging in to Autonomous Portal...]")
-                query = "my results" # generic trigger
+                query = query_lower = "my results" # generic trigger
         # ----------------------------
         
         # Add to conversation history
         self.conversation_history.append(original_query)
-        if len(self.conversation_history) > 3:
-            self.conversation_history.pop(0)
         
         # Select and execute tool
-        tool_name = self._select_tool(query)
+        tool_name = self._select_tool(query_lower)
         
         # Track start time for analytics
         start_time = time.time()
         success = False
         error_msg = None
+        result = None
+        sent = False  # Whether any part of the answer has reached the caller
         
         try:
             if tool_name == "check_static_facts":
@@ -284,7 +310,8 @@ class SimplifiedMCPAgent:
                 if not self.tools.portal_credentials:
                     # Enable login state
                     self.waiting_for_credential = True
-                    return "To access your results from the Student Portal, I need your **Roll Number** (I'll ask for your password next):"
+                    yield "To access your results from the Student Portal, I need your **Roll Number** (I'll ask for your password next):"
+                    return
                 
                 # Use stored credentials
                 if len(self.tools.portal_credentials) == 3:
@@ -295,9 +322,9 @@ class SimplifiedMCPAgent:
                 
                 # Determine data type based on query
                 data_type = "all"
-                if "result" in query.lower() or "grade" in query.lower() or "mark" in query.lower():
+                if "result" in query_lower or "grade" in query_lower or "mark" in query_lower:
                     data_type = "results"
-                elif "dashboard" in query.lower() or "attendance" in query.lower():
+                elif "dashboard" in query_lower or "attendance" in query_lower:
                     data_type = "dashboard"
                     
                 result = self.tools.query_student_portal(username, password, data_type, portal_type)
@@ -307,42 +334,59 @@ class SimplifiedMCPAgent:
             
             success = result.get("success", False)
             
-            # Format response with LLM
-            response = self._format_response(result, tool_name, query)
-            
-            # Log analytics
-            if self.analytics:
-                response_time_ms = int((time.time() - start_time) * 1000)
-                cached = result.get("cached", False)
-                self.analytics.log_query(query, tool_name, response_time_ms, success, cached)
-            
-            # Translate response if needed
+            # Format response with LLM (translated responses are sent whole)
+            chunks = self._format_response_stream(result, tool_name, query)
             if self.translator and user_language != 'english':
-                response = self.translator.process_response(response, user_language)
-            
-            return response
+                chunks = [self.translator.process_response("".join(chunks), user_language)]
+            for chunk in chunks:
+                sent = True
+                yield chunk
         
         except Exception as e:
             error_msg = str(e)
+            success = False
             
-            # Log failed query
-            if self.analytics:
+            # An answer already partly sent is left as is rather than
+            # having an error message appended to it
+            if not sent:
+                error_response = f"I apologize, but I encountered an error: {error_msg}. Please try again."
+                
+                # Translate error if needed
+                if self.translator and user_language != 'english':
+                    error_response = self.translator.process_response(error_response, user_language)
+                
+                yield error_response
+        
+        finally:
+            # Log analytics, also when a streaming client disconnects
+            # mid-answer (the generator is closed at a yield)
+            if self.analytics and (result is not None or error_msg is not None):
                 response_time_ms = int((time.time() - start_time) * 1000)
-                self.analytics.log_query(query, tool_name, response_time_ms, False, False, error_msg)
-            
-            error_response = f"I apologize, but I encountered an error: {error_msg}. Please try again."
-            
-            # Translate error if needed
-            if self.translator and user_language != 'english':
-                error_response = self.translator.process_response(error_response, user_language)
-            
-            return error_response
+                cached = bool(result and result.get("cached", False)) and error_msg is None
+                self.analytics.log_query(query, tool_name, response_time_ms, success, cached, error_msg)
     
-    def _format_response(self, result: dict, tool_name: str, query: str) -> str:
-        """Format tool result into user-friendly response with smart LLM usage"""
+    def _format_response_stream(self, result: dict, tool_name: str, query: str):
+        """
+        Format tool result into user-friendly response with smart LLM usage
+        
+        Yields chunks: an LLM answer is passed on as Ollama generates it.
+        """
+        raw_data, may_use_llm = self._raw_response(result, tool_name)
+        
+        # Smart decision: use LLM only when beneficial
+        if may_use_llm and self._should_use_llm(raw_data, tool_name):
+            # Falls back to the raw data itself if the LLM fails
+            yield from self._make_friendly_stream(raw_data, query)
+            return
+        
+        # Fast path: return raw data (instant response!)
+        yield raw_data
+    
+    def _raw_response(self, result: dict, tool_name: str):
+        """Tool result as text, and whether it may be reworded by the LLM"""
         
         if not result.get("success"):
-            return "I couldn't find specific information. Please try rephrasing your question or visit https://tkrcet.ac.in for more details."
+            return "I couldn't find specific information. Please try rephrasing your question or visit https://tkrcet.ac.in for more details.", False
         
         # Extract raw data based on tool type
         if tool_name == "query_student_portal":
@@ -400,7 +444,7 @@ class SimplifiedMCPAgent:
                 if "attendance" in dash:
                     raw_data += f"Attendance: {dash['attendance']}\n"
             
-            return raw_data  # Return directly without LLM processing to preserve formatting
+            return raw_data, False  # Return directly without LLM processing to preserve formatting
 
         elif tool_name == "check_static_facts":
             raw_data = result.get("answer", "")
@@ -408,7 +452,7 @@ class SimplifiedMCPAgent:
         elif tool_name == "scrape_latest_notices":
             notices = result.get("notices", [])
             if not notices:
-                return "No recent notices found. Please check the college website at https://tkrcet.ac.in/notifications"
+                return "No recent notices found. Please check the college website at https://tkrcet.ac.in/notifications", False
             
             raw_data = "Latest notices from TKRCET:\n"
             for i, notice in enumerate(notices[:3], 1):
@@ -425,18 +469,15 @@ class SimplifiedMCPAgent:
         else:  # search_website
             raw_data = result.get("results", "")
         
-        # Smart decision: use LLM only when beneficial
-        if self._should_use_llm(raw_data, tool_name):
-            friendly_response = self._make_friendly(raw_data, query)
-            # If LLM succeeded, return it; otherwise fall back to raw
-            if friendly_response != raw_data:
-                return friendly_response
-        
-        # Fast path: return raw data (instant response!)
-        return raw_data
+        return raw_data, True
     
-    def _make_friendly(self, raw_data: str, query: str) -> str:
-        """Use Gemma 2:2b to create friendly, contextual response"""
+    def _make_friendly_stream(self, raw_data: str, query: str):
+        """
+        Use Gemma 2:2b to create friendly, contextual response
+        
+        Yields the answer as Ollama generates it, or raw_data if the LLM
+        produces nothing (slow/unavailable).
+        """
         
         prompt = f"""You are TKRCET College Assistant, a helpful and friendly chatbot. Answer the student's question based on the information provided.
 
@@ -455,32 +496,46 @@ Instructions:
 
 Your friendly response:"""
 
+        emitted = False
+        pending = ""  # Text not yet yielded (leading/trailing whitespace is held back)
         try:
-            import requests
-            
-            response = requests.post(
+            response = self._ollama_session.post(
                 'http://localhost:11434/api/generate',
                 json={
                     'model': 'gemma2:2b',
                     'prompt': prompt,
-                    'stream': False,
+                    'stream': True,
                     'options': {
                         'temperature': 0.7,
                         'num_predict': 150  # Limit response length
                     }
                 },
+                stream=True,
                 timeout=30  # Increased from 10s to 30s
             )
             
-            if response.status_code == 200:
-                llm_response = response.json().get('response', '').strip()
-                if llm_response:
-                    return llm_response
+            with response:
+                if response.status_code == 200:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        pending += chunk.get('response', '')
+                        if not emitted:
+                            pending = pending.lstrip()
+                        text = pending.rstrip()
+                        if text:
+                            emitted = True
+                            yield text
+                            pending = pending[len(text):]
+                        if chunk.get('done'):
+                            break
         
         except Exception as e:
             # Silently fall back to raw data (expected behavior when Ollama is slow/unavailable)
             pass
         
         # Fallback: return raw data
-        return raw_data
+        if not emitted:
+            yield raw_data
 
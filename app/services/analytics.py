@@ -28,6 +28,11 @@ class AnalyticsSystem:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # Write-ahead log (persists in the database file): each logged query is
+        # appended to the WAL instead of rewriting pages in the main file, and
+        # the dashboard can read while a query is being logged
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # Queries table - log every query
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS queries (
@@ -71,6 +76,9 @@ class AnalyticsSystem:
         """Log a single query with metadata"""
         try:
             conn = sqlite3.connect(self.db_path)
+            # WAL commits need no fsync at NORMAL (synced at checkpoints); a crash
+            # can lose only the last few log rows, never corrupt the database
+            conn.execute("PRAGMA synchronous=NORMAL")
             cursor = conn.cursor()
             
             # Insert query log
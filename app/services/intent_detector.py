@@ -2,6 +2,7 @@
 Intent Detector - Routes queries to RAG or SQL system
 """
 import re
+from functools import lru_cache
 
 class IntentDetector:
     def __init__(self):
@@ -21,6 +22,9 @@ class IntentDetector:
             'fee', 'course', 'program', 'timings', 'contact',
             'placement', 'faculty', 'dean', 'ncc', 'nss'
         ]
+        
+        # Intent is a pure function of the normalized query: memoize it
+        self._cached_intent = lru_cache(maxsize=4096)(self._classify)
     
     def detect_intent(self, query):
         """
@@ -31,6 +35,15 @@ class IntentDetector:
             'general' - Query about college info
             'hybrid' - Query needs both RAG and SQL
         """
+        # Case and extra whitespace don't affect any of the checks below
+        return self._cached_intent(" ".join(query.lower().split()))
+    
+    def detect_intents(self, queries):
+        """Detect intent for each query in a batch (same order)"""
+        return [self.detect_intent(query) for query in queries]
+    
+    def _classify(self, query):
+        """Uncached intent classification (see detect_intent)"""
         query_lower = query.lower()
         
         # Check for student-related patterns
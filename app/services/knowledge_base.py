@@ -0,0 +1,111 @@
+"""
+Knowledge base, greeting set and keyword matcher shared by the agent, its
+tools and UltraRAG
+
+Kept free of heavy imports, so reading the static facts never loads the
+retrieval stack (numpy, FAISS, BM25, sentence-transformers).
+"""
+
+import re
+
+
+# ============================================================
+# KNOWLEDGE BASE - Instant answers for critical facts
+# ============================================================
+KNOWLEDGE_BASE = {
+    "personnel": {
+        "principal": "Dr. D. V. Ravi Shankar",
+        "vice_principal": "Dr. A. Suresh Rao (also HoD of CSE & Dean Academics)",
+        "secretary": "Dr. T. Harinath Reddy",
+        "chairman": "Sri. Teegala Krishna Reddy",
+        "hod": {
+            "cse": "Dr. A. Suresh Rao",
+            "cse-aiml": "Dr. B. Sunil Srinivas",
+            "csm": "Dr. B. Sunil Srinivas",
+            "cse-ds": "Dr. V. Krishna",
+            "csd": "Dr. V. Krishna",
+            "ece": "Dr. D. Nageshwar Rao",
+            "eee": "Dr. K. Raju",
+            "it": "Dr. R. Muruanantham",
+            "mech": "Mr. D. Rushi Kumar",
+            "civil": "Mr. K.V.R Satya Sai",
+            "mba": "Dr. K. Gyaneswari"
+        }
+    },
+    "timings": {
+        "working_hours": "9:40 AM to 4:20 PM (Monday-Saturday)",
+        "lunch_break": "12:40 PM to 1:20 PM"
+    },
+    "history": {
+        "established": "2002",
+        "founder": "Sri. Teegala Krishna Reddy",
+        "affiliation": "JNTUH (Jawaharlal Nehru Technological University Hyderabad)",
+        "location": "Meerpet, Hyderabad - 500097, Telangana",
+        "campus_size": "20 acres"
+    },
+    "admissions": {
+        "process": "Admissions are through TS EAPCET counseling for B.Tech, PGCET for M.Tech, and direct admission for MBA. Visit the admissions office or website for detailed procedure.",
+        "eligibility": "10+2 with Physics, Chemistry, and Mathematics for B.Tech. Graduation in relevant field for M.Tech/MBA.",
+        "contact": "Visit https://tkrcet.ac.in/admissions for admission details and fee structure."
+    },
+    "courses": {
+        "ug": ["CSE", "CSE-AIML", "CSE-DS", "ECE", "EEE", "IT", "Mechanical", "Civil"],
+        "pg": ["M.Tech in CSE", "M.Tech in Power Electronics", "MBA"],
+        "total": "8 UG programs and 3 PG programs"
+    },
+    "facilities": {
+        "main": "State-of-the-art labs, smart classrooms, Wi-Fi campus, digital library, hostel (boys & girls), transport, sports ground, auditorium, NCC, incubation center, and medical facilities.",
+        "special": "Virtual labs, R&D center (21,000 sq ft), industry partnerships with ECIL and others."
+    },
+    "accreditation": {
+        "naac": "A+ Grade",
+        "nba": "NBA Accredited",
+        "approvals": "AICTE approved, UGC recognized 2(f) & 12(B)"
+    },
+    "scholarships": {
+        "types": ["Merit-based", "Need-based", "Sports quota", "SC/ST/OBC", "Minority scholarships"],
+        "merit": "Available for students with >85% in 12th or CGPA >8.5 in college",
+        "fee_reimbursement": "TS Government fee reimbursement scheme for eligible students (income criteria apply)",
+        "central_schemes": "Central sector scholarship, Post-matric scholarship for SC/ST/OBC students",
+        "contact": "Contact admissions office or visit https://tkrcet.ac.in/scholarships for details",
+        "application": "Apply through TS ePass portal for state scholarships"
+    },
+    "fees": {
+        "btech_annual": "₹75,000 - ₹85,000 per year (approx, varies by category)",
+        "mtech_annual": "₹60,000 - ₹70,000 per year (approx)",
+        "mba_annual": "₹50,000 - ₹60,000 per year (approx)",
+        "hostel": "₹40,000 - ₹50,000 per year (including mess)",
+        "transport": "₹15,000 - ₹25,000 per year (route-dependent)",
+        "note": "Fees vary by category (Management/Convener quota). Contact admissions for exact details: admissions@tkrcet.ac.in"
+    },
+    "events": {
+        "tech_fest": "Annual tech fest 'TECHNOVA' with coding competitions, robotics, hackathons, and technical workshops",
+        "cultural_fest": "Cultural fest 'KALANJALI' with music, dance, drama, and art competitions",
+        "sports_day": "Annual sports meet with inter-department cricket, football, volleyball, and athletics",
+        "hackathons": "Regular 24-hour coding hackathons and coding competitions",
+        "workshops": "Industry expert workshops on AI/ML, Cloud Computing, IoT, and emerging technologies",
+        "clubs": "Active IEEE, CSI, Coding Club, Robotics Club, and Literary Club"
+    },
+    "exam_schedule": {
+        "mid_term_1": "Usually in September (Odd semester) / February (Even semester)",
+        "mid_term_2": "Usually in November (Odd semester) / April (Even semester)",
+        "semester_end": "December (Odd semester) / May (Even semester)",
+        "internal_marks": "Based on mid-terms, assignments, and attendance",
+        "note": "Check college website or notice board for exact dates each semester"
+    },
+    "library": {
+        "name": "Central Library",
+        "collection": "50,000+ books, e-journals, IEEE digital library access",
+        "timings": "9:00 AM to 5:00 PM (Monday-Saturday)",
+        "facilities": "Digital library, reading rooms, e-resources, internet access",
+        "membership": "Free for all students and faculty"
+    }
+}
+
+# Exact-match greetings (frozenset for O(1) lookup)
+GREETINGS = frozenset(['hi', 'hello', 'hey', 'how are you', 'how r u', 'how are u', 'whats up', "what's up"])
+
+
+def any_of(keywords):
+    """Compile keywords into one substring alternation (same as any(kw in text ...), one pass)"""
+    return re.compile('|'.join(map(re.escape, keywords)))
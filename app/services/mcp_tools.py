@@ -3,18 +3,86 @@ MCP Tools for AgentCPM-Explore
 Provides tools for static facts, web scraping, and database queries with smart caching
 """
 
+import hashlib
+import importlib.util
+import json
+import re
+import sqlite3
 import time
-import requests
-from bs4 import BeautifulSoup
+from functools import cached_property
+from pathlib import Path
 from typing import Dict, Any, Optional
 
+from app.services.knowledge_base import KNOWLEDGE_BASE  # Plain dict module: no retrieval stack
+
+# requests/bs4 are imported inside the scraping methods so that serving
+# static facts never pays for them at startup.
+
+# Prefer the C-backed lxml parser when installed (optional dependency)
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# Logged-in portal sessions are reused for a bit less than the 5 minute
+# portal data TTL, so a cache miss never hits a session about to expire
+PORTAL_SESSION_TTL = 240  # seconds
+PORTAL_SESSION_MAX = 64
+
+# Static fact categories in priority order (first matching category answers).
+# Values are regex alternations of the keywords that trigger the category.
+FACT_PATTERNS = {
+    'principal': r'principal|principle',  # handle typos like 'principle'
+    'vice_principal': r'vice principal',
+    'secretary': r'secretary',
+    'chairman': r'chairman',
+    'founder': r'founder|founded by|who started',
+    'hod': r'hod|head of department',
+    'timings': r'timing|hours|time',
+    'location': r'location|address|where',
+    'established': r'established|founded|started',
+    'courses': r'course|program|branch|dept',
+    'facilities': r'facilit|infrastructure|transport|ground|playground|sports',
+    'accreditation': r'naac|nba|accredit',
+    'food': r'food|canteen|mess|cafeteria',
+    'about': r'about college|tell about|college life|about tkrcet',
+    'scholarship': r'scholarship|financial aid',
+    'fees': r'fee|fees|cost|tuition',
+    'events': r'event|fest|festival|competition',
+    'exams': r'exam|test|mid|semester',
+    'library': r'library|book',
+}
+
 
 class TwoTierCache:
     """Smart caching with static and dynamic tiers"""
     
-    def __init__(self):
+    __slots__ = ('static_cache', 'dynamic_cache', 'db_path')
+    
+    def __init__(self, db_path: Optional[str] = 'app/database/mcp_cache.db'):
         self.static_cache = {}   # Never expires
         self.dynamic_cache = {}  # TTL-based
+        
+        # Dynamic entries are mirrored to SQLite so they survive restarts
+        # and can be shared between worker processes (None = memory only)
+        self.db_path = db_path
+        if self.db_path:
+            self._init_database()
+    
+    def _init_database(self):
+        """Create the persistent dynamic cache table if it doesn't exist"""
+        try:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS dynamic_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    timestamp REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"  ⚠ Persistent cache unavailable: {e}")
+            self.db_path = None
     
     def get_static(self, key: str) -> Optional[Any]:
         """Get from static cache"""
@@ -25,16 +93,56 @@ class TwoTierCache:
         self.static_cache[key] = value
     
     def get_dynamic(self, key: str, ttl_seconds: int = 3600) -> Optional[Any]:
-        """Get from dynamic cache with TTL check"""
-        if key in self.dynamic_cache:
-            value, timestamp = self.dynamic_cache[key]
+        """Get from dynamic cache with TTL check (falls back to disk on miss)"""
+        entry = self.dynamic_cache.get(key)
+        if entry is None:
+            entry = self._load_dynamic(key)
+            if entry is not None:
+                self.dynamic_cache[key] = entry  # Re-hydrate memory tier
+        
+        if entry is not None:
+            value, timestamp = entry
             if time.time() - timestamp < ttl_seconds:
                 return value
         return None
     
-    def set_dynamic(self, key: str, value: Any):
-        """Set in dynamic cache with timestamp"""
-        self.dynamic_cache[key] = (value, time.time())
+    def set_dynamic(self, key: str, value: Any, persist: bool = True):
+        """Set in dynamic cache with timestamp (persist=False keeps it in memory only)"""
+        timestamp = time.time()
+        self.dynamic_cache[key] = (value, timestamp)
+        if persist:
+            self._store_dynamic(key, value, timestamp)
+    
+    def _load_dynamic(self, key: str):
+        """Read a (value, timestamp) entry from the persistent cache"""
+        if not self.db_path:
+            return None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute(
+                "SELECT value, timestamp FROM dynamic_cache WHERE key = ?", (key,)
+            ).fetchone()
+            conn.close()
+            if row:
+                return json.loads(row[0]), row[1]
+        except Exception as e:
+            print(f"  ⚠ Cache read error: {e}")
+        return None
+    
+    def _store_dynamic(self, key: str, value: Any, timestamp: float):
+        """Write an entry to the persistent cache"""
+        if not self.db_path:
+            return
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO dynamic_cache (key, value, timestamp) VALUES (?, ?, ?)",
+                (key, json.dumps(value), timestamp)
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"  ⚠ Cache write error: {e}")
 
 
 class CollegeMCPTools:
@@ -44,16 +152,35 @@ class CollegeMCPTools:
         self.cache = TwoTierCache()
         self.base_url = "https://tkrcet.ac.in"
         
-        # Load knowledge base
-        from app.services.ultra_rag import KNOWLEDGE_BASE
+        # Load knowledge base (static answers are formatted on first use)
         self.kb = KNOWLEDGE_BASE
+        self._hods = tuple(self.kb['personnel']['hod'].items())
+        
+        # Zero-width lookaheads make finditer test every position, so a keyword
+        # isn't swallowed by an overlapping earlier match (at the same position
+        # the higher-priority category wins)
+        self._fact_re = re.compile('|'.join(
+            f'(?=(?P<{name}>{pattern}))' for name, pattern in FACT_PATTERNS.items()
+        ))
+        
+        # Keep-alive HTTP session for the website scrapers (created on first scrape)
+        self._http = None
         
-        # Initialize student portal scraper
-        from app.services.student_portal_scraper import StudentPortalScraper, AutonomousPortalScraper
-        self.portal_scraper = StudentPortalScraper()
-        self.autonomous_scraper = AutonomousPortalScraper()
+        # Student SQL system, kept so its response cache and per-thread
+        # connections are reused across queries (created on first database query)
+        self._sql = None
+        
+        # Logged-in portal scrapers kept alive between portal queries
+        self._portal_sessions = {}  # (portal, USERNAME) -> (scraper, password hash, login time)
         self.portal_credentials = None  # Will be set when needed
         self.selected_portal = "regular"  # 'regular' or 'autonomous'
+        
+        # Question words ignored when extracting search keywords
+        self._stop_words = frozenset([
+            'what', 'is', 'the', 'how', 'to', 'can', 'i', 'get', 'about', 'tell', 'me',
+            'are', 'there', 'any', 'does', 'do', 'where', 'when', 'who', 'which', '?'
+        ])
+        self._kw_regex_cache = {}  # keywords tuple -> (bytes pattern, text pattern)
     
     def get_tool_definitions(self):
         """Return tool definitions for AgentCPM"""
@@ -144,182 +271,172 @@ class CollegeMCPTools:
             }
         ]
     
+    @cached_property
+    def _static_answers(self) -> Dict[str, str]:
+        """The fixed answer for every static fact category (built on first use)"""
+        kb = self.kb
+        personnel, history, timings = kb['personnel'], kb['history'], kb['timings']
+        courses, facilities, accreditation = kb['courses'], kb['facilities'], kb['accreditation']
+        answers = {}
+        
+        # Personnel
+        answers['principal'] = f"The Principal of TKRCET is {personnel['principal']}."
+        answers['vice_principal'] = f"The Vice Principal is {personnel['vice_principal']}."
+        answers['secretary'] = f"The Secretary of TKRCET is {personnel['secretary']}."
+        answers['chairman'] = f"The Chairman of TKRCET is {personnel['chairman']}."
+        answers['founder'] = f"TKRCET was founded by {history['founder']} in {history['established']}."
+        
+        # Timings, location, history
+        answers['timings'] = f"College timings: {timings['working_hours']}. Lunch break: {timings['lunch_break']}."
+        answers['location'] = f"TKRCET is located at {history['location']}."
+        answers['established'] = f"TKRCET was established in {history['established']} on a {history['campus_size']} campus."
+        
+        # Courses/Branches
+        ug = ', '.join(courses['ug'])
+        pg = ', '.join(courses['pg'])
+        answers['courses'] = f"TKRCET offers {courses['total']}. UG Programs: {ug}. PG Programs: {pg}."
+        
+        # Facilities and accreditation
+        answers['facilities'] = f"{facilities['main']} Special Features: {facilities['special']}"
+        answers['accreditation'] = f"TKRCET is {accreditation['naac']} accredited, {accreditation['nba']}, and {accreditation['approvals']}."
+        answers['food'] = "Yes, TKRCET has canteen facilities on campus providing food for students and staff. The college facilities include canteen services along with other amenities."
+        answers['about'] = f"TKRCET (Teegala Krishna Reddy Engineering College) was established in {history['established']} at {history['location']}. It is affiliated to {history['affiliation']} and is {accreditation['naac']} accredited. The college offers {courses['total']} with excellent facilities including {facilities['main']}"
+        
+        # Scholarships
+        sch = kb['scholarships']
+        answer = f"TKRCET offers various scholarships: {', '.join(sch['types'])}. "
+        answer += f"Merit scholarship: {sch['merit']}. "
+        answer += f"{sch['fee_reimbursement']}. "
+        answer += f"Apply through: {sch['application']}. Contact: {sch['contact']}"
+        answers['scholarship'] = answer
+        
+        # Fees
+        fees = kb['fees']
+        answer = f"TKRCET Fee Structure (approximate): "
+        answer += f"B.Tech: {fees['btech_annual']}, "
+        answer += f"M.Tech: {fees['mtech_annual']}, "
+        answer += f"MBA: {fees['mba_annual']}. "
+        answer += f"Hostel: {fees['hostel']}, Transport: {fees['transport']}. "
+        answer += f"Note: {fees['note']}"
+        answers['fees'] = answer
+        
+        # Events
+        events = kb['events']
+        answer = f"TKRCET Events: "
+        answer += f"Tech Fest: {events['tech_fest']}. "
+        answer += f"Cultural Fest: {events['cultural_fest']}. "
+        answer += f"Sports: {events['sports_day']}. "
+        answer += f"Also: {events['hackathons']}, {events['workshops']}"
+        answers['events'] = answer
+        
+        # Exam schedule
+        exams = kb['exam_schedule']
+        answer = f"Exam Schedule: "
+        answer += f"Mid-term 1: {exams['mid_term_1']}, "
+        answer += f"Mid-term 2: {exams['mid_term_2']}, "
+        answer += f"Semester End: {exams['semester_end']}. "
+        answer += f"{exams['internal_marks']}. {exams['note']}"
+        answers['exams'] = answer
+        
+        # Library
+        lib = kb['library']
+        answer = f"{lib['name']}: {lib['collection']}. "
+        answer += f"Timings: {lib['timings']}. "
+        answer += f"Facilities: {lib['facilities']}. {lib['membership']}"
+        answers['library'] = answer
+        
+        return answers
+    
+    def _static_answer(self, category: str, query_lower: str) -> Optional[str]:
+        """Answer for a matched category, or None if its extra conditions fail"""
+        if category == 'principal' and 'vice' in query_lower:
+            return None
+        
+        if category == 'hod':
+            # Check for multiple departments in query
+            found_hods = []
+            for dept, hod in self._hods:
+                if dept in query_lower:
+                    found_hods.append(f"The HOD of {dept.upper()} is {hod}")
+            return ". ".join(found_hods) + "." if found_hods else None
+        
+        return self._static_answers[category]
+    
     def check_static_facts(self, query: str) -> Dict[str, Any]:
         """
         Check static facts from knowledge base (0.1s)
         Cached permanently
         """
-        query_lower = query.lower()
+        query_lower = query.lower().strip()
         
         # Check cache first
         cached = self.cache.get_static(query_lower)
         if cached:
             return {"success": True, "answer": cached, "cached": True}
         
-        # Personnel queries (handle typos like 'principle')
-        if ('principal' in query_lower or 'principle' in query_lower) and 'vice' not in query_lower:
-            answer = f"The Principal of TKRCET is {self.kb['personnel']['principal']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        if 'vice principal' in query_lower:
-            answer = f"The Vice Principal is {self.kb['personnel']['vice_principal']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        if 'secretary' in query_lower:
-            answer = f"The Secretary of TKRCET is {self.kb['personnel']['secretary']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        if 'chairman' in query_lower:
-            answer = f"The Chairman of TKRCET is {self.kb['personnel']['chairman']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        if 'founder' in query_lower or 'founded by' in query_lower or 'who started' in query_lower:
-            answer = f"TKRCET was founded by {self.kb['history']['founder']} in {self.kb['history']['established']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        if 'hod' in query_lower or 'head of department' in query_lower:
-            # Check for multiple departments in query
-            found_hods = []
-            for dept, hod in self.kb['personnel']['hod'].items():
-                if dept in query_lower:
-                    found_hods.append(f"The HOD of {dept.upper()} is {hod}")
-            
-            if found_hods:
-                answer = ". ".join(found_hods) + "."
-                self.cache.set_static(query_lower, answer)
-                return {"success": True, "answer": answer, "cached": False}
-        
-        # Timings
-        if 'timing' in query_lower or 'hours' in query_lower or 'time' in query_lower:
-            answer = f"College timings: {self.kb['timings']['working_hours']}. Lunch break: {self.kb['timings']['lunch_break']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Location
-        if 'location' in query_lower or 'address' in query_lower or 'where' in query_lower:
-            answer = f"TKRCET is located at {self.kb['history']['location']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Established
-        if 'established' in query_lower or 'founded' in query_lower or 'started' in query_lower:
-            answer = f"TKRCET was established in {self.kb['history']['established']} on a {self.kb['history']['campus_size']} campus."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Courses/Branches (handle "how many branches")
-        if 'course' in query_lower or 'program' in query_lower or 'branch' in query_lower or 'dept' in query_lower:
-            ug = ', '.join(self.kb['courses']['ug'])
-            pg = ', '.join(self.kb['courses']['pg'])
-            answer = f"TKRCET offers {self.kb['courses']['total']}. UG Programs: {ug}. PG Programs: {pg}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Facilities (including transportation and sports)
-        if 'facilit' in query_lower or 'infrastructure' in query_lower or 'transport' in query_lower or 'ground' in query_lower or 'playground' in query_lower or 'sports' in query_lower:
-            answer = f"{self.kb['facilities']['main']} Special Features: {self.kb['facilities']['special']}"
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Accreditation
-        if 'naac' in query_lower or 'nba' in query_lower or 'accredit' in query_lower:
-            answer = f"TKRCET is {self.kb['accreditation']['naac']} accredited, {self.kb['accreditation']['nba']}, and {self.kb['accreditation']['approvals']}."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Food/Canteen queries
-        if 'food' in query_lower or 'canteen' in query_lower or 'mess' in query_lower or 'cafeteria' in query_lower:
-            answer = "Yes, TKRCET has canteen facilities on campus providing food for students and staff. The college facilities include canteen services along with other amenities."
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # General "tell about college" or "college life"
-        if any(phrase in query_lower for phrase in ['about college', 'tell about', 'college life', 'about tkrcet']):
-            answer = f"TKRCET (Teegala Krishna Reddy Engineering College) was established in {self.kb['history']['established']} at {self.kb['history']['location']}. It is affiliated to {self.kb['history']['affiliation']} and is {self.kb['accreditation']['naac']} accredited. The college offers {self.kb['courses']['total']} with excellent facilities including {self.kb['facilities']['main']}"
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Scholarship queries
-        if 'scholarship' in query_lower or 'financial aid' in query_lower:
-            sch = self.kb['scholarships']
-            answer = f"TKRCET offers various scholarships: {', '.join(sch['types'])}. "
-            answer += f"Merit scholarship: {sch['merit']}. "
-            answer += f"{sch['fee_reimbursement']}. "
-            answer += f"Apply through: {sch['application']}. Contact: {sch['contact']}"
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Fee queries
-        if 'fee' in query_lower or 'fees' in query_lower or 'cost' in query_lower or 'tuition' in query_lower:
-            fees = self.kb['fees']
-            answer = f"TKRCET Fee Structure (approximate): "
-            answer += f"B.Tech: {fees['btech_annual']}, "
-            answer += f"M.Tech: {fees['mtech_annual']}, "
-            answer += f"MBA: {fees['mba_annual']}. "
-            answer += f"Hostel: {fees['hostel']}, Transport: {fees['transport']}. "
-            answer += f"Note: {fees['note']}"
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Event queries
-        if 'event' in query_lower or 'fest' in query_lower or 'festival' in query_lower or 'competition' in query_lower:
-            events = self.kb['events']
-            answer = f"TKRCET Events: "
-            answer += f"Tech Fest: {events['tech_fest']}. "
-            answer += f"Cultural Fest: {events['cultural_fest']}. "
-            answer += f"Sports: {events['sports_day']}. "
-            answer += f"Also: {events['hackathons']}, {events['workshops']}"
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Exam schedule queries
-        if 'exam' in query_lower or 'test' in query_lower or 'mid' in query_lower or 'semester' in query_lower:
-            exams = self.kb['exam_schedule']
-            answer = f"Exam Schedule: "
-            answer += f"Mid-term 1: {exams['mid_term_1']}, "
-            answer += f"Mid-term 2: {exams['mid_term_2']}, "
-            answer += f"Semester End: {exams['semester_end']}. "
-            answer += f"{exams['internal_marks']}. {exams['note']}"
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
-        
-        # Library queries
-        if 'library' in query_lower or 'book' in query_lower:
-            lib = self.kb['library']
-            answer = f"{lib['name']}: {lib['collection']}. "
-            answer += f"Timings: {lib['timings']}. "
-            answer += f"Facilities: {lib['facilities']}. {lib['membership']}"
-            self.cache.set_static(query_lower, answer)
-            return {"success": True, "answer": answer, "cached": False}
+        # One regex scan finds every category mentioned in the query;
+        # FACT_PATTERNS order decides which one answers
+        hits = {match.lastgroup for match in self._fact_re.finditer(query_lower)}
+        if hits:
+            for category in FACT_PATTERNS:
+                if category in hits:
+                    answer = self._static_answer(category, query_lower)
+                    if answer:
+                        self.cache.set_static(query_lower, answer)
+                        return {"success": True, "answer": answer, "cached": False}
         
         # Not found
         return {"success": False, "error": "No static fact found for this query"}
     
+    @staticmethod
+    def _conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for a previously cached page"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers['If-None-Match'] = entry["etag"]
+            if entry.get("last_modified"):
+                headers['If-Modified-Since'] = entry["last_modified"]
+        return headers
+    
+    @staticmethod
+    def _validators(response) -> Dict[str, Optional[str]]:
+        """Cache validators sent by the server with a page"""
+        return {
+            "etag": response.headers.get('ETag'),
+            "last_modified": response.headers.get('Last-Modified')
+        }
+    
     def scrape_latest_notices(self) -> Dict[str, Any]:
         """
         Scrape latest notices from website (4-6s)
-        Cached for 1 hour
+        Cached for 1 hour, then revalidated with ETag/Last-Modified
         """
         cache_key = "latest_notices"
         
         # Check cache
         cached = self.cache.get_dynamic(cache_key, ttl_seconds=3600)
         if cached:
-            return {"success": True, "notices": cached, "cached": True}
+            return {"success": True, "notices": cached["notices"], "cached": True}
         
         # Scrape website
         try:
+            from bs4 import BeautifulSoup
+            
             url = f"{self.base_url}/notifications"
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=5)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            
+            # Revalidate the expired entry instead of re-downloading it
+            stale = self.cache.get_dynamic(cache_key, ttl_seconds=float('inf'))
+            headers.update(self._conditional_headers(stale))
+            response = self._http_session().get(url, headers=headers, timeout=5)
+            if response.status_code == 304 and stale:
+                self.cache.set_dynamic(cache_key, stale)  # Unchanged: restart the TTL
+                return {"success": True, "notices": stale["notices"], "cached": True}
+            
+            soup = BeautifulSoup(response.content, HTML_PARSER)
             
             # Extract notices (adjust selectors based on actual website)
             notices = []
@@ -335,8 +452,8 @@ class CollegeMCPTools:
                 text = soup.get_text(strip=True)[:500]
                 notices = [{'title': 'Latest information from website', 'content': text}]
             
-            # Cache result
-            self.cache.set_dynamic(cache_key, notices)
+            # Cache result with its validators
+            self.cache.set_dynamic(cache_key, {"notices": notices, **self._validators(response)})
             
             return {"success": True, "notices": notices, "cached": False}
         
@@ -346,23 +463,33 @@ class CollegeMCPTools:
     def scrape_placements(self) -> Dict[str, Any]:
         """
         Scrape placement data from website (4-6s)
-        Cached for 1 hour
+        Cached for 1 hour, then revalidated with ETag/Last-Modified
         """
         cache_key = "placements"
         
         # Check cache
         cached = self.cache.get_dynamic(cache_key, ttl_seconds=3600)
         if cached:
-            return {"success": True, "data": cached, "cached": True}
+            return {"success": True, "data": cached["data"], "cached": True}
         
         # Scrape website
         try:
+            from bs4 import BeautifulSoup
+            
             url = f"{self.base_url}/placements"
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=5)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            
+            # Revalidate the expired entry instead of re-downloading it
+            stale = self.cache.get_dynamic(cache_key, ttl_seconds=float('inf'))
+            headers.update(self._conditional_headers(stale))
+            response = self._http_session().get(url, headers=headers, timeout=5)
+            if response.status_code == 304 and stale:
+                self.cache.set_dynamic(cache_key, stale)  # Unchanged: restart the TTL
+                return {"success": True, "data": stale["data"], "cached": True}
+            
+            soup = BeautifulSoup(response.content, HTML_PARSER)
             
             # Extract placement data
             text = soup.get_text(strip=True)[:1000]
@@ -386,8 +513,8 @@ class CollegeMCPTools:
                 "content": text
             }
             
-            # Cache result
-            self.cache.set_dynamic(cache_key, data)
+            # Cache result with its validators
+            self.cache.set_dynamic(cache_key, {"data": data, **self._validators(response)})
             
             return {"success": True, "data": data, "cached": False}
         
@@ -399,7 +526,8 @@ class CollegeMCPTools:
         Query student database for placement statistics (privacy-protected)
         Returns ONLY aggregate data, never individual student records
         """
-        cache_key = f"db_{query.lower()}"
+        query_lower = query.lower().strip()
+        cache_key = f"db_{query_lower}"
         
         # Check cache
         cached = self.cache.get_dynamic(cache_key, ttl_seconds=3600)
@@ -407,13 +535,8 @@ class CollegeMCPTools:
             return {"success": True, "data": cached, "cached": True}
         
         try:
-            # Import SQL system
-            from app.services.sql_system import SQLSystem
-            
             # Query database (privacy-protected)
-            sql_system = SQLSystem()
-            result = sql_system.query_students(query)
-            sql_system.close()
+            result = self.sql_system.query_students(query)
             
             # Cache result
             self.cache.set_dynamic(cache_key, result)
@@ -424,12 +547,40 @@ class CollegeMCPTools:
             print(f"  ⚠ SQL Query failed: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    def _keyword_patterns(self, keywords):
+        """
+        Compiled case-insensitive regexes for the keywords: (raw bytes pattern
+        matching any keyword, text pattern with one group per distinct keyword,
+        the distinct keywords in group order)
+        
+        The text pattern stops only where some keyword starts, then zero-width
+        lookaheads test every keyword at that position - so a keyword inside
+        or at the start of another ('placement' in 'placements') still gets
+        its own group.
+        """
+        key = tuple(keywords)
+        patterns = self._kw_regex_cache.get(key)
+        if patterns is None:
+            distinct = tuple(dict.fromkeys(key))
+            any_keyword = '|'.join(re.escape(k) for k in distinct)
+            patterns = (
+                re.compile(b'|'.join(re.escape(k.encode('utf-8')) for k in distinct), re.IGNORECASE),
+                re.compile(f'(?=(?:{any_keyword}))' + ''.join(f'(?=({re.escape(k)})?)' for k in distinct),
+                           re.IGNORECASE),
+                distinct,
+            )
+            if len(self._kw_regex_cache) >= 256:
+                self._kw_regex_cache.clear()  # Keep the cache bounded
+            self._kw_regex_cache[key] = patterns
+        return patterns
+    
     def search_website(self, query: str) -> Dict[str, Any]:
         """
         Search multiple relevant pages on website (5-10s)
         Cached for 1 hour per query
         """
-        cache_key = f"search_{query.lower()}"
+        query_lower = query.lower().strip()
+        cache_key = f"search_{query_lower}"
         
         # Check cache
         cached = self.cache.get_dynamic(cache_key, ttl_seconds=3600)
@@ -437,19 +588,16 @@ class CollegeMCPTools:
             return {"success": True, "results": cached, "cached": True}
         
         # Extract keywords from query (remove question words)
-        query_lower = query.lower()
-        stop_words = ['what', 'is', 'the', 'how', 'to', 'can', 'i', 'get', 'about', 'tell', 'me', 
-                      'are', 'there', 'any', 'does', 'do', 'where', 'when', 'who', 'which', '?']
-        
         keywords = []
         for word in query_lower.split():
             clean_word = word.strip('?,.')
-            if clean_word not in stop_words and len(clean_word) > 2:
+            if clean_word not in self._stop_words and len(clean_word) > 2:
                 keywords.append(clean_word)
         
         # If no keywords extracted, use original query
         if not keywords:
             keywords = [query_lower]
+        raw_pattern, text_pattern, distinct_keywords = self._keyword_patterns(keywords)
         
         # Define relevant pages to search
         pages_to_search = [
@@ -469,17 +617,23 @@ class CollegeMCPTools:
         
         # Search across multiple pages
         try:
+            from bs4 import BeautifulSoup
+            
             found_results = []
             
             for page in pages_to_search:
                 try:
                     url = f"{self.base_url}{page}"
-                    response = requests.get(url, timeout=3)
+                    response = self._http_session().get(url, timeout=3)
                     
                     if response.status_code != 200:
                         continue
                     
-                    soup = BeautifulSoup(response.content, 'html.parser')
+                    # Cheap pre-scan of the raw bytes: skip parsing pages with no keyword at all
+                    if not raw_pattern.search(response.content):
+                        continue
+                    
+                    soup = BeautifulSoup(response.content, HTML_PARSER)
                     
                     # Remove navigation, header, footer, scripts, styles
                     for element in soup(['nav', 'header', 'footer', 'script', 'style', 'iframe']):
@@ -493,19 +647,21 @@ class CollegeMCPTools:
                     else:
                         text = soup.get_text()
                     
-                    text_lower = text.lower()
-                    
-                    # Search for ANY keyword in page text
-                    matches = 0
-                    for keyword in keywords:
-                        if keyword in text_lower:
-                            matches += 1
+                    # Single pass over the page: first offset of each distinct keyword
+                    first_offsets = {}
+                    for match in text_pattern.finditer(text):
+                        for keyword, found in zip(distinct_keywords, match.groups()):
+                            if found is not None and keyword not in first_offsets:
+                                first_offsets[keyword] = match.start()
+                        if len(first_offsets) == len(distinct_keywords):
+                            break
+                    # Repeated keywords count once per occurrence in the query, as before
+                    matches = sum(1 for keyword in keywords if keyword in first_offsets)
                     
                     # If found at least one keyword
                     if matches > 0:
                         # Find best context (around first keyword match)
-                        first_keyword = keywords[0]
-                        idx = text_lower.find(first_keyword)
+                        idx = first_offsets.get(keywords[0], -1)
                         
                         if idx != -1:
                             context = text[max(0, idx-150):min(len(text), idx+300)].strip()
@@ -540,28 +696,87 @@ class CollegeMCPTools:
                 # Provide helpful fallback
                 results = f"I couldn't find specific information about '{query}' on the website. "
                 results += f"However, you can:\n\n"
-                combined_text = f"I couldn't find specific information about '{query}' on the website. "
-                combined_text += f"However, you can:\n\n"
-                combined_text += f"1. Visit the college website: https://tkrcet.ac.in\n"
-                combined_text += f"2. Contact the college directly\n"
-                combined_text += f"3. Try asking your question differently with more specific keywords"
+                results += f"1. Visit the college website: https://tkrcet.ac.in\n"
+                results += f"2. Contact the college directly\n"
+                results += f"3. Try asking your question differently with more specific keywords"
             
             # Cache result
-            self.cache.set_dynamic(cache_key, combined_text)
+            self.cache.set_dynamic(cache_key, results)
             
             # Suggest KB expansion if content is useful
-            try:
-                from app.services.kb_expander import KnowledgeBaseExpander
-                expander = KnowledgeBaseExpander()
-                expander.suggest_kb_update(query, combined_text)
-            except:
-                pass  # KB expansion is optional
+            if found_results:
+                try:
+                    from app.services.kb_expander import KnowledgeBaseExpander
+                    expander = KnowledgeBaseExpander()
+                    expander.suggest_kb_update(query, results)
+                except:
+                    pass  # KB expansion is optional
             
-            return {"success": True, "results": combined_text, "cached": False}
+            return {"success": True, "results": results, "cached": False}
         
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _new_portal_scraper(self, portal: str):
+        """Create a fresh (logged-out) scraper for the given portal"""
+        if portal == "autonomous":
+            from app.services.student_portal_scraper import AutonomousPortalScraper
+            return AutonomousPortalScraper()
+        from app.services.student_portal_scraper import StudentPortalScraper
+        return StudentPortalScraper()
+    
+    @property
+    def sql_system(self):
+        """Student SQL system (loaded on first access)"""
+        if self._sql is None:
+            from app.services.sql_system import SQLSystem
+            self._sql = SQLSystem()
+        return self._sql
+    
+    def _http_session(self):
+        """Shared requests.Session: repeat fetches from the college site reuse its connection"""
+        if self._http is None:
+            import requests
+            self._http = requests.Session()
+        return self._http
+    
+    def _drop_portal_session(self, key):
+        """Forget a pooled portal session and log it out"""
+        entry = self._portal_sessions.pop(key, None)
+        if entry:
+            try:
+                entry[0].logout()
+            except:
+                pass
+    
+    def _get_portal_session(self, portal: str, username: str, password: str):
+        """
+        Return (scraper, success, message, reused) for a logged-in portal
+        session, reusing a pooled one for the same credentials when it is still fresh
+        """
+        # Evict sessions past their TTL
+        now = time.time()
+        for key, (_, _, login_time) in list(self._portal_sessions.items()):
+            if now - login_time >= PORTAL_SESSION_TTL:
+                self._drop_portal_session(key)
+        
+        key = (portal, username.upper())
+        password_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
+        
+        entry = self._portal_sessions.get(key)
+        if entry and entry[1] == password_hash and entry[0].is_logged_in:
+            return entry[0], True, "Login successful (session reused)", True
+        self._drop_portal_session(key)
+        
+        scraper = self._new_portal_scraper(portal)
+        success, message = scraper.login(username, password)
+        if success:
+            if len(self._portal_sessions) >= PORTAL_SESSION_MAX:
+                oldest = min(self._portal_sessions, key=lambda k: self._portal_sessions[k][2])
+                self._drop_portal_session(oldest)
+            self._portal_sessions[key] = (scraper, password_hash, now)
+        return scraper, success, message, False
+    
     def query_student_portal(self, username: str, password: str, data_type: str = "all", portal_type: str = "regular") -> Dict[str, Any]:
         """
         Query student portal for personal data (results, attendance, etc.)
@@ -579,12 +794,8 @@ class CollegeMCPTools:
         # Determine scraper based on portal type (or stored preference)
         portal = portal_type if portal_type else getattr(self, "selected_portal", "regular")
         
-        if portal == "autonomous":
-            scraper = self.autonomous_scraper
-            title = "Autonomous Portal"
-        else:
-            scraper = self.portal_scraper
-            title = "Regular Portal"
+        title = "Autonomous Portal" if portal == "autonomous" else "Regular Portal"
+        session_key = (portal, username.upper())
             
         cache_key = f"portal_{portal}_{username.upper()}_{data_type}"
         
@@ -594,8 +805,8 @@ class CollegeMCPTools:
             return {"success": True, "data": cached, "cached": True}
         
         try:
-            # Login to portal
-            success, message = scraper.login(username, password)
+            # Login to portal (or reuse a live session for these credentials)
+            scraper, success, message, reused = self._get_portal_session(portal, username, password)
             
             if not success:
                 return {
@@ -613,6 +824,17 @@ class CollegeMCPTools:
             
             if data_type in ["results", "all"]:
                 results = scraper.fetch_results()
+                if not results.get("success") and reused:
+                    # Pooled session may have expired server-side: log in again once
+                    self._drop_portal_session(session_key)
+                    scraper, success, message, reused = self._get_portal_session(portal, username, password)
+                    if not success:
+                        return {
+                            "success": False,
+                            "error": f"Login failed ({title}): {message}"
+                        }
+                    result["login_message"] = message
+                    results = scraper.fetch_results()
                 result["data"]["results"] = results
             
             # Dashboard might not be available for Autonomous yet, but try
@@ -620,19 +842,13 @@ class CollegeMCPTools:
                 dashboard = scraper.fetch_dashboard_data()
                 result["data"]["dashboard"] = dashboard
             
-            # Logout
-            scraper.logout()
-            
-            # Cache the result
-            self.cache.set_dynamic(cache_key, result["data"])
+            # Cache the result (personal data stays in memory, never on disk)
+            self.cache.set_dynamic(cache_key, result["data"], persist=False)
             
             return result
         
         except Exception as e:
-            # Make sure to logout even on error
-            try:
-                scraper.logout()
-            except:
-                pass
+            # Don't keep a session that just failed
+            self._drop_portal_session(session_key)
             
             return {"success": False, "error": str(e)}
@@ -3,6 +3,99 @@ Prompt construction module for the college chatbot.
 Handles building context-aware prompts with relaxed strictness for better user experience.
 """
 
+import sys
+
+
+# ============================================================
+# PROMPT SKELETONS - static role + instructions come first so every
+# prompt of a kind shares the same cacheable prefix; only the tail
+# (history, context, query) changes between calls
+# ============================================================
+_CONTEXT_SYSTEM = """You are a helpful TKRCET College Assistant.
+
+INSTRUCTIONS:
+1. Answer the question using the information provided below
+2. Synthesize a helpful response from the available context
+3. Keep response to 2-5 sentences - be concise but complete
+4. Extract and use any relevant details from the context
+5. If the context contains useful information, use it to form your answer
+6. Be helpful and informative - provide value to the student
+7. For admission/facilities/courses: summarize key points from the context
+"""
+_CONTEXT_INFO = "\nAvailable Information:\n"
+_CONTEXT_QUESTION = "\n\nStudent's Question: "
+_CONTEXT_ANSWER = "\n\nAnswer:"
+
+_PERSON_SYSTEM = """You are a helpful TKRCET College Assistant.
+
+Answer only the question asked, in 2-3 sentences, using only names and titles (Dr., Prof., HOD, etc.) that appear in the Available Information below, quoted exactly; never invent or mention unrelated people. If no relevant person is present, reply: "I don't have specific details about this person. Please contact the college administration."
+"""
+_PERSON_INFO = "\nAvailable Information About People/Staff:\n"
+_PERSON_QUESTION = "\n\nQuestion: "
+_PERSON_ANSWER = "\n\nResponse:"
+
+_GENERAL_SYSTEM = """You are a helpful TKRCET College Assistant.
+
+Your purpose is to answer questions about college admissions, courses, facilities, campus life, and general information.
+
+Instructions:
+1. Answer based on the information provided below
+2. If the answer is in the context, provide it directly
+3. If you need more details but have partial information, provide what you know
+4. If information is completely missing, suggest contacting the relevant department
+5. Be helpful, clear, and informative
+6. Use bullet points for lists when helpful
+"""
+_GENERAL_INFO = "\nAvailable Information:\n"
+_GENERAL_QUESTION = "\n\nQuestion: "
+_GENERAL_ANSWER = "\n\nResponse:"
+
+_STATIC_PREFIXES = (_CONTEXT_SYSTEM, _PERSON_SYSTEM, _GENERAL_SYSTEM)
+
+
+def _build_skeletons(system, history_label, info, no_docs, question, answer):
+    """
+    Precompute the static pieces of one prompt kind for every
+    (has_docs, has_history) combination.
+    
+    Each entry is (head, mid, question, answer); a prompt is
+    head + history + mid + context + question + query + answer.
+    """
+    skeletons = {}
+    for has_docs in (True, False):
+        for has_history in (True, False):
+            head = system + (f"\n{history_label}:\n" if has_history else "")
+            mid = ("\n" if has_history else "") + info
+            if has_docs:
+                skeletons[(has_docs, has_history)] = (head, mid, question, answer)
+            else:
+                # Fixed "nothing found" text folds into the static middle
+                skeletons[(has_docs, has_history)] = (head, mid + no_docs + question, "", answer)
+    return skeletons
+
+
+# Prompt skeletons keyed by (kind, has_docs, has_history)
+PROMPTS = {}
+for _kind, _parts in (
+    ('context', (_CONTEXT_SYSTEM, "Recent conversation", _CONTEXT_INFO,
+                 "No relevant information found in the knowledge base.", _CONTEXT_QUESTION, _CONTEXT_ANSWER)),
+    ('person', (_PERSON_SYSTEM, "Previous messages", _PERSON_INFO,
+                "No information available", _PERSON_QUESTION, _PERSON_ANSWER)),
+    ('general', (_GENERAL_SYSTEM, "Context from previous chat", _GENERAL_INFO,
+                 "No relevant documents found.", _GENERAL_QUESTION, _GENERAL_ANSWER)),
+):
+    for _key, _skeleton in _build_skeletons(*_parts).items():
+        # Interned so the static text exists once and identical prefixes share identity
+        PROMPTS[(_kind, *_key)] = tuple(sys.intern(part) for part in _skeleton)
+del _kind, _parts, _key, _skeleton
+
+
+def _fill(kind, query, documents, history_context, max_docs):
+    """Splice the dynamic parts of a request into its precomputed skeleton"""
+    head, mid, question, answer = PROMPTS[(kind, bool(documents), bool(history_context))]
+    context = "• " + "\n• ".join(doc['text'] for doc in documents[:max_docs]) if documents else ""
+    return "".join((head, history_context, mid, context, question, query, answer))
+
 
 def build_context_prompt(query, documents, history_context=""):
     """
@@ -20,44 +113,8 @@ def build_context_prompt(query, documents, history_context=""):
         Formatted prompt string
     """
     
-    # Check if this is a person query
-    person_keywords = ['who', 'hod', 'principal', 'director', 'dean', 'registrar', 'founder', 'head', 'staff', 'teacher', 'professor']
-    is_person_query = any(kw in query.lower() for kw in person_keywords)
-    
-    if not documents:
-        context = "No relevant information found in the knowledge base."
-        has_context = False
-    else:
-        context = "\n".join([f"• {doc['text']}" for doc in documents[:4]])  # Show complete documents
-        has_context = True
-
-    history_text = ""
-    if history_context:
-        history_text = f"\nRecent conversation:\n{history_context}\n"
-
-    # Optimized prompt - concise, relevant, and focused
-    prompt = f"""You are a helpful TKRCET College Assistant.
-
-{history_text}
-Available Information:
-{context}
-
-Student's Question: {query}
-
-INSTRUCTIONS:
-1. Answer the question using the information provided above
-2. Synthesize a helpful response from the available context
-3. Keep response to 2-5 sentences - be concise but complete
-4. Extract and use any relevant details from the context
-5. If the context contains useful information, use it to form your answer
-6. Be helpful and informative - provide value to the student
-7. For admission/facilities/courses: summarize key points from the context
-
-Answer:"""
-    
-    return prompt
-    
-    return prompt
+    # Optimized prompt - concise, relevant, and focused (complete documents)
+    return _fill('context', query, documents, history_context, 4)
 
 
 def build_person_query_prompt(query, documents, history_context=""):
@@ -66,40 +123,8 @@ def build_person_query_prompt(query, documents, history_context=""):
     More helpful with available context.
     """
     
-    if not documents:
-        context_info = "No information available"
-        has_context = False
-    else:
-        context_info = "\n".join([f"• {doc['text']}" for doc in documents[:5]])  # Show complete documents for person queries
-        has_context = True
-
-    history_text = ""
-    if history_context:
-        history_text = f"\nPrevious messages:\n{history_context}\n"
-
-    prompt = f"""You are a helpful TKRCET College Assistant.
-
-{history_text}
-Available Information About People/Staff:
-{context_info}
-
-Question: {query}
-
-CRITICAL Instructions:
-1. Answer ONLY the specific question asked about the person/role
-2. ONLY use names and details that appear in the "Available Information About People/Staff" section above
-3. DO NOT make up or invent any names - if you don't see a name above, say you don't have that information
-4. CAREFULLY READ the context and extract the exact name with title (Dr., Prof., etc.)
-5. If you find a name with "Head", "Principal", "Dean", "HOD", or similar title, QUOTE IT EXACTLY
-6. Provide the person's full name, designation, and relevant details FROM THE CONTEXT ONLY
-7. Keep response to 2-3 sentences - be concise and direct
-8. If no relevant person is mentioned in the context above, say: "I don't have specific details about this person. Please contact the college administration."
-9. NEVER mention unrelated people or topics from the context
-10. Be precise and factual - no filler phrases
-
-Response:"""
-
-    return prompt
+    # Show complete documents for person queries
+    return _fill('person', query, documents, history_context, 5)
 
 
 def build_general_prompt(query, documents, history_context=""):
@@ -108,33 +133,33 @@ def build_general_prompt(query, documents, history_context=""):
     Balanced between helpfulness and accuracy.
     """
     
-    if not documents:
-        context = "No relevant documents found."
-    else:
-        context = "\n".join([f"• {doc['text']}" for doc in documents[:5]])  # Show complete documents
-
-    history_text = ""
-    if history_context:
-        history_text = f"\nContext from previous chat:\n{history_context}\n"
-
-    prompt = f"""You are a helpful TKRCET College Assistant.
+    # Show complete documents
+    return _fill('general', query, documents, history_context, 5)
 
-Your purpose is to answer questions about college admissions, courses, facilities, campus life, and general information.
-
-{history_text}
-Available Information:
-{context}
-
-Question: {query}
-
-Instructions:
-1. Answer based on the information provided above
-2. If the answer is in the context, provide it directly
-3. If you need more details but have partial information, provide what you know
-4. If information is completely missing, suggest contacting the relevant department
-5. Be helpful, clear, and informative
-6. Use bullet points for lists when helpful
 
-Response:"""
-
-    return prompt
+def to_cached_messages(prompt):
+    """
+    Split a built prompt into chat messages for providers with prompt caching.
+    
+    The static role/instruction prefix becomes a system message marked with an
+    ephemeral cache_control breakpoint; the dynamic remainder (history, context,
+    question) becomes the user message.
+    
+    Args:
+        prompt: String returned by one of the build_*_prompt functions
+        
+    Returns:
+        List of message dicts
+    """
+    for static in _STATIC_PREFIXES:
+        if prompt.startswith(static):
+            return [
+                {
+                    "role": "system",
+                    "content": [{"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}]
+                },
+                {"role": "user", "content": prompt[len(static):]}
+            ]
+    
+    # Unknown prompt layout: nothing to cache
+    return [{"role": "user", "content": prompt}]
@@ -1,25 +1,173 @@
 """
 Query Router - Intelligent routing between RAG and SQL systems
 """
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 from app.services.intent_detector import IntentDetector
-from app.services.ultra_rag import UltraRAGSystem  # Using new UltraRAG system
-from app.services.sql_system import SQLSystem
+
+logger = logging.getLogger(__name__)
+
+# Response cache for 'general' (RAG) answers; student data is never cached
+RESPONSE_CACHE_SIZE = 1000
+SEMANTIC_CACHE_THRESHOLD = 0.97  # Cosine similarity for a near-duplicate hit
+
+# Unambiguous student-data terms; every match is also a student keyword
+# for IntentDetector, so the fast path never disagrees with it
+SQL_FASTPATH = re.compile(r'\b(students?|cgpa|roll number|marks)\b', re.IGNORECASE)
 
 class QueryRouter:
     def __init__(self):
         """Initialize query router with all systems"""
-        print("Initializing Query Router...")
+        logger.debug("Initializing Query Router...")
         
         self.intent_detector = IntentDetector()
-        print("✓ Intent Detector loaded")
+        logger.debug("✓ Intent Detector loaded")
+        
+        # Any general keyword makes the query general/hybrid, so it disables the fast path
+        self._general_re = re.compile(
+            '|'.join(map(re.escape, self.intent_detector.general_keywords)), re.IGNORECASE
+        )
+        
+        # Backends are loaded on first use, so a process that only sees
+        # student queries never loads the embedding model / FAISS index
+        self._rag = None
+        self._sql = None
+        
+        # Two-tier response cache: exact normalized query, then embedding similarity
+        self._exact_cache = OrderedDict()  # normalized query -> response (LRU order)
+        self._sem_cache = OrderedDict()    # normalized query -> (matrix row, response)
+        self._sem_matrix = None            # Unit embeddings, one preallocated row per entry
+        self._sem_row_keys = [None] * RESPONSE_CACHE_SIZE  # matrix row -> cache key
+        # Batches and streaming callers use the cache from several threads
+        self._cache_lock = threading.Lock()
+        
+        # Worker thread for overlapping RAG with SQL on hybrid queries
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        
+        logger.debug("✓ Query Router ready!")
+    
+    @property
+    def rag_system(self):
+        """UltraRAG system (loaded on first access)"""
+        if self._rag is None:
+            from app.services.ultra_rag import UltraRAGSystem  # Using new UltraRAG system
+            self._rag = UltraRAGSystem()
+            logger.debug("✓ UltraRAG System loaded")
+        return self._rag
+    
+    @property
+    def sql_system(self):
+        """Student SQL system (loaded on first access)"""
+        if self._sql is None:
+            from app.services.sql_system import SQLSystem
+            self._sql = SQLSystem()
+            logger.debug("✓ SQL System loaded")
+        return self._sql
+    
+    def _embed(self, queries):
+        """
+        Encode queries with the shared model in one call
+        
+        Returns a float32 matrix (one row per query) or None if unavailable.
+        Rows are the raw encoder output UltraRAGSystem searches FAISS with, so
+        a single encode serves both the semantic cache and retrieval; a cache
+        hit doesn't need the RAG indexes at all.
+        """
+        try:
+            from app.services.ultra_rag import QUERY_ENCODE_BATCH_SIZE, get_embedding_model
+            
+            return get_embedding_model().encode(
+                list(queries), batch_size=QUERY_ENCODE_BATCH_SIZE, show_progress_bar=False, convert_to_numpy=True
+            ).astype('float32', copy=False)
+        except Exception:
+            return None
+    
+    def _cache_lookup(self, key, query, embedding=None):
+        """
+        Look up a cached response for this query
+        
+        Args:
+            embedding: Precomputed query embedding row (computed here if omitted)
+        
+        Returns:
+            (response or None, query embedding or None) - the embedding is
+            handed back so a miss can be stored without re-encoding
+        """
+        with self._cache_lock:
+            response = self._exact_cache.get(key)
+            if response is not None:
+                self._exact_cache.move_to_end(key)
+                if key in self._sem_cache:
+                    self._sem_cache.move_to_end(key)
+                return response, None
+        
+        # Encoding happens outside the lock
+        if embedding is None:
+            embeddings = self._embed([query])
+            embedding = None if embeddings is None else embeddings[0]
+        if embedding is None:
+            return None, embedding
         
-        self.rag_system = UltraRAGSystem()  # Using new UltraRAG system
-        print("✓ UltraRAG System loaded")
+        import numpy as np
         
-        self.sql_system = SQLSystem()
-        print("✓ SQL System loaded")
+        query_unit = embedding / np.linalg.norm(embedding)
+        with self._cache_lock:
+            if not self._sem_cache:
+                return None, embedding
+            # One matrix-vector product over all rows; unused rows are zero and never match
+            scores = self._sem_matrix @ query_unit
+            best = int(np.argmax(scores))
+            if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+                hit_key = self._sem_row_keys[best]
+                self._sem_cache.move_to_end(hit_key)  # LRU, so eviction drops the least recently used
+                return self._sem_cache[hit_key][1], embedding
+        return None, embedding
+    
+    def _cache_store(self, key, response, embedding):
+        """Remember a response in both cache tiers (LRU-bounded)"""
+        from app.services.ultra_rag import SNIPPET_FALLBACK_PREFIX
+        
+        # Snippet fallbacks (Ollama down or warming up) are retried next time,
+        # as UltraRAGSystem does for its own cache
+        if response.startswith(SNIPPET_FALLBACK_PREFIX):
+            return
         
-        print("✓ Query Router ready!\n")
+        with self._cache_lock:
+            self._exact_cache[key] = response
+            self._exact_cache.move_to_end(key)
+            if len(self._exact_cache) > RESPONSE_CACHE_SIZE:
+                self._exact_cache.popitem(last=False)
+            
+            if embedding is not None:
+                import numpy as np
+                
+                if self._sem_matrix is None:
+                    self._sem_matrix = np.zeros((RESPONSE_CACHE_SIZE, embedding.shape[0]), dtype=np.float32)
+                
+                if key in self._sem_cache:
+                    row = self._sem_cache[key][0]
+                    self._sem_cache.move_to_end(key)
+                elif len(self._sem_cache) < RESPONSE_CACHE_SIZE:
+                    row = len(self._sem_cache)
+                else:
+                    # Reuse the least recently used entry's row
+                    _, (row, _) = self._sem_cache.popitem(last=False)
+                
+                self._sem_matrix[row] = embedding / np.linalg.norm(embedding)
+                self._sem_row_keys[row] = key
+                self._sem_cache[key] = (row, response)
+    
+    @staticmethod
+    def _combine_hybrid(sql_result, rag_result):
+        """Combine results intelligently (single allocation)"""
+        return "".join((
+            "Based on your query:\n\n**Student Data:**\n", str(sql_result),
+            "\n\n**College Information:**\n", str(rag_result),
+        ))
     
     def route_query(self, query):
         """
@@ -31,41 +179,159 @@ class QueryRouter:
         Returns:
             Response string
         """
+        # Plain student-data queries go straight to SQL without the classifier
+        if SQL_FASTPATH.search(query) and not self._general_re.search(query):
+            return self.sql_system(query)
+        
         # Detect intent
         intent = self.intent_detector.detect_intent(query)
         
         if intent == 'general':
+            # Repeated / near-duplicate questions skip retrieval and LLM
+            cache_key = query.strip().lower()
+            cached, embedding = self._cache_lookup(cache_key, query)
+            if cached is not None:
+                return cached
+            
             # Use RAG system only
-            return self.rag_system(query)
+            response = self.rag_system(query, embedding=embedding)
+            self._cache_store(cache_key, response, embedding)
+            return response
         
         elif intent == 'student':
             # Use SQL system only
             return self.sql_system(query)
         
         elif intent == 'hybrid':
-            # Use both systems and combine results
-            rag_result = self.rag_system(query)
+            # Use both systems concurrently and combine results.
+            # RAG (embedding + LLM) runs on the worker while SQL
+            # answers on this thread.
+            rag_future = self._pool.submit(self.rag_system, query)
             sql_result = self.sql_system(query)
+            rag_result = rag_future.result()
             
-            # Combine results intelligently
-            response = "Based on your query:\n\n"
-            response += f"**Student Data:**\n{sql_result}\n\n"
-            response += f"**College Information:**\n{rag_result}"
-            return response
+            return self._combine_hybrid(sql_result, rag_result)
         
         else:
             return "I couldn't understand your query. Please try rephrasing."
     
-    def __call__(self, query):
-        """Make class callable"""
+    def route_queries(self, queries):
+        """
+        Route a batch of queries
+        
+        The RAG side of every general (cache-miss) and hybrid query is
+        answered in one UltraRAGSystem.batch call - one embedding pass, one
+        FAISS search, concurrent LLM calls - while hybrid SQL lookups run on
+        this thread. Student queries go through route_query one by one.
+        
+        Args:
+            queries: List of natural language queries
+        
+        Returns:
+            List of response strings, in input order
+        """
+        responses = [None] * len(queries)
+        general, hybrid = [], []
+        for i, (query, intent) in enumerate(zip(queries, self.intent_detector.detect_intents(queries))):
+            if intent == 'general':
+                general.append(i)
+            elif intent == 'hybrid':
+                hybrid.append(i)
+            else:
+                responses[i] = self.route_query(query)
+        
+        if not general and not hybrid:
+            return responses
+        
+        # One batched encode serves the semantic cache and FAISS for all of them
+        embeddings = self._embed([queries[i] for i in general + hybrid])
+        if embeddings is None:
+            embeddings = [None] * (len(general) + len(hybrid))
+        
+        misses = []
+        for i, embedding in zip(general, embeddings):
+            cache_key = queries[i].strip().lower()
+            cached, embedding = self._cache_lookup(cache_key, queries[i], embedding)
+            if cached is not None:
+                responses[i] = cached
+            else:
+                misses.append((i, cache_key, embedding))
+        
+        rag_indices = [i for i, _, _ in misses] + hybrid
+        if not rag_indices:
+            return responses
+        
+        rag_future = self._pool.submit(
+            self.rag_system.batch,
+            [queries[i] for i in rag_indices],
+            embeddings=[embedding for _, _, embedding in misses] + list(embeddings[len(general):]),
+        )
+        sql_results = [self.sql_system(queries[i]) for i in hybrid]
+        rag_results = rag_future.result()
+        
+        for (i, cache_key, embedding), response in zip(misses, rag_results):
+            self._cache_store(cache_key, response, embedding)
+            responses[i] = response
+        for i, sql_result, rag_result in zip(hybrid, sql_results, rag_results[len(misses):]):
+            responses[i] = self._combine_hybrid(sql_result, rag_result)
+        
+        return responses
+    
+    def stream_query(self, query):
+        """
+        Route query like route_query, but yield the response in chunks
+        
+        RAG answers are streamed token-by-token from the LLM; SQL results
+        and cached answers arrive as a single chunk.
+        """
+        if SQL_FASTPATH.search(query) and not self._general_re.search(query):
+            yield self.sql_system(query)
+            return
+        
+        intent = self.intent_detector.detect_intent(query)
+        
+        if intent == 'general':
+            cache_key = query.strip().lower()
+            cached, embedding = self._cache_lookup(cache_key, query)
+            if cached is not None:
+                yield cached
+                return
+            
+            # Only a fully streamed answer is cached
+            parts = []
+            for chunk in self.rag_system.stream(query, embedding=embedding):
+                parts.append(chunk)
+                yield chunk
+            self._cache_store(cache_key, "".join(parts), embedding)
+        
+        elif intent == 'student':
+            yield self.sql_system(query)
+        
+        elif intent == 'hybrid':
+            # Student data is quick, so it goes out first while the LLM streams after it
+            yield "Based on your query:\n\n**Student Data:**\n"
+            yield str(self.sql_system(query))
+            yield "\n\n**College Information:**\n"
+            yield from self.rag_system.stream(query)
+        
+        else:
+            yield "I couldn't understand your query. Please try rephrasing."
+    
+    def __call__(self, query, stream=False):
+        """Make class callable (stream=True returns a chunk generator)"""
+        if stream:
+            return self.stream_query(query)
         return self.route_query(query)
     
     def close(self):
         """Close all connections"""
-        self.sql_system.close()
+        self._pool.shutdown(wait=True)
+        if self._sql is not None:
+            self._sql.close()
 
 if __name__ == "__main__":
     # Test query router
+    logging.basicConfig(level=logging.DEBUG)
     router = QueryRouter()
     
     print("="*70)
@@ -3,32 +3,119 @@ SQL System for Student Queries
 Handles natural language queries about student data
 """
 import sqlite3
-import pandas as pd
 import re
+import threading
+from collections import OrderedDict
+
+# pandas is imported where the student summary builds its DataFrame, so
+# lookups and placement stats (plain sqlite3) never pay for it.
+
+_ROLL_RE = re.compile(r'\b(\d{2}[A-Z]\d{2}[A-Z]\d{4})\b')
+_ROLL_NUM_RE = re.compile(r'\b(\d{5,10})\b')
+_NAME_RE = re.compile(r'\b([A-Z][a-z]+ [A-Z][a-z]+)\b')
+_CGPA_RE = re.compile(r'cgpa\s*([><=]+)\s*(\d+\.?\d*)')
+# query_students special cases ('how many' and 'placed' may come in any order)
+_PLACEMENT_STATS_RE = re.compile(r'^(?=.*how many)(?=.*placed)', re.DOTALL)
+_COMPANIES_RE = re.compile(r'companies|recruiter')
+STUDENT_CACHE_SIZE = 256  # Recent query_students responses kept per SQLSystem
+CGPA_OPERATORS = {'>', '<', '>=', '<=', '=', '=='}
+CGPA_OPERATOR_ALIASES = {'=>': '>=', '=<': '<='}  # Common reversed spellings
+
+# BRANCH is matched through UPPER(), so that index is on the expression
+STUDENT_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_roll ON students("ROLL NO");
+CREATE INDEX IF NOT EXISTS idx_branch ON students(UPPER(BRANCH));
+CREATE INDEX IF NOT EXISTS idx_cgpa ON students(CGPA);
+CREATE INDEX IF NOT EXISTS idx_placed_branch ON students("COMPANY PLACED", BRANCH);
+"""
 
 class SQLSystem:
+    # Fixed statements keep the same text on every call, so sqlite3's
+    # per-connection statement cache reuses the compiled plan
+    # One pass over the placed students; the CTE is referenced three times,
+    # so SQLite materialises it once. Rows are (kind, label, count, avg_cgpa).
+    PLACEMENT_STATS_SQL = """WITH placed AS (
+                                 SELECT BRANCH, CGPA, "COMPANY PLACED" AS company FROM students 
+                                 WHERE "COMPANY PLACED" IS NOT NULL AND "COMPANY PLACED" != 'Not Placed')
+                             SELECT 'total', NULL, COUNT(*), AVG(CGPA) FROM placed
+                             UNION ALL
+                             SELECT 'branch', BRANCH, COUNT(*), NULL FROM placed
+                             WHERE BRANCH IS NOT NULL GROUP BY BRANCH
+                             UNION ALL
+                             SELECT 'company', company, COUNT(*), NULL FROM placed GROUP BY company
+                             ORDER BY 3 DESC"""
+    TOP_COMPANIES_SQL = """SELECT "COMPANY PLACED", COUNT(*) as count 
+                           FROM students 
+                           WHERE "COMPANY PLACED" IS NOT NULL AND "COMPANY PLACED" != 'Not Placed'
+                           GROUP BY "COMPANY PLACED"
+                           ORDER BY count DESC
+                           LIMIT 10"""
+    
     def __init__(self, db_path='app/database/students.db'):
         """Initialize SQL system with student database"""
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        
+        # One SQLSystem serves every Flask worker thread: they share a single
+        # read-only connection, one statement at a time (opened on first use)
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._ensure_indexes()
+        
+        # Whitespace-normalised query -> response, in LRU order
+        self._responses = OrderedDict()
+        self._responses_lock = threading.Lock()
         
         # Get table schema
         self.columns = self._get_columns()
     
+    def _query(self, sql, params=(), limit=None):
+        """
+        Run a statement on the shared connection; returns (rows, column names)
+        
+        The rows are fetched while holding the lock, so a cursor is never
+        read by one thread while another executes on the same connection.
+        """
+        with self._conn_lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute("PRAGMA query_only=ON")
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchall() if limit is None else cursor.fetchmany(limit)
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+        return rows, columns
+    
+    def _ensure_indexes(self):
+        """Create the indexes the student queries filter and group on (no-op once they exist)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.executescript(STUDENT_INDEXES_SQL)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Read-only deployments still work, just with full table scans
+            print(f"⚠ Could not create student indexes: {e}")
+    
     def _get_columns(self):
         """Get list of columns in students table"""
-        cursor = self.conn.cursor()
-        cursor.execute("PRAGMA table_info(students)")
-        columns = [row[1] for row in cursor.fetchall()]
+        rows, _ = self._query("PRAGMA table_info(students)")
+        columns = [row[1] for row in rows]
         return columns
     
-    def extract_entities(self, query):
+    def _read_frame(self, sql, params=()):
+        """Run a statement on the shared connection and load the rows into a DataFrame"""
+        import pandas as pd
+        rows, columns = self._query(sql, params)
+        return pd.DataFrame.from_records(rows, columns=columns)
+    
+    def extract_entities(self, query, query_lower=None):
         """Extract entities from natural language query"""
-        query_lower = query.lower()
+        if query_lower is None:
+            query_lower = query.lower()
         entities = {}
         
         # Extract roll number (student ID)
-        roll_match = re.search(r'\b(\d{2}[A-Z]\d{2}[A-Z]\d{4})\b', query) or re.search(r'\b(\d{5,10})\b', query)
+        roll_match = _ROLL_RE.search(query) or _ROLL_NUM_RE.search(query)
         if roll_match:
             entities['roll_no'] = roll_match.group(1)
         
@@ -40,14 +127,15 @@ class SQLSystem:
                 break
         
         # Extract name (capitalized words)
-        name_match = re.search(r'\b([A-Z][a-z]+ [A-Z][a-z]+)\b', query)
+        name_match = _NAME_RE.search(query)
         if name_match:
             entities['name'] = name_match.group(1)
         
         # Extract CGPA condition
-        cgpa_match = re.search(r'cgpa\s*([><=]+)\s*(\d+\.?\d*)', query_lower)
+        cgpa_match = _CGPA_RE.search(query_lower)
         if cgpa_match:
-            entities['cgpa_operator'] = cgpa_match.group(1)
+            op = cgpa_match.group(1)
+            entities['cgpa_operator'] = CGPA_OPERATOR_ALIASES.get(op, op)
             entities['cgpa_value'] = float(cgpa_match.group(2))
         
         # Extract placement status - check negatives FIRST
@@ -58,24 +146,32 @@ class SQLSystem:
         
         return entities
     
-    def build_sql_query(self, entities):
-        """Build SQL query from extracted entities"""
-        base_query = "SELECT * FROM students"
+    def build_sql_query(self, entities, limit=50):
+        """Build a parameterized SQL query from extracted entities; returns (sql, params)"""
+        # Project only what query_students renders; ROLL NO is never shown
+        base_query = 'SELECT "NAME", "BRANCH", "CGPA", "COMPANY PLACED" FROM students'
         conditions = []
+        params = []
         
         if 'roll_no' in entities:
-            conditions.append(f"\"ROLL NO\" = '{entities['roll_no']}'")
+            conditions.append("\"ROLL NO\" = ?")
+            params.append(entities['roll_no'])
         
         if 'branch' in entities:
-            conditions.append(f"UPPER(BRANCH) = '{entities['branch']}'")
+            conditions.append("UPPER(BRANCH) = ?")
+            params.append(entities['branch'])
         
         if 'name' in entities:
-            conditions.append(f"NAME LIKE '%{entities['name']}%'")
+            conditions.append("NAME LIKE ?")
+            params.append(f"%{entities['name']}%")
         
         if 'cgpa_operator' in entities:
+            # Operators can't be bound, so only known comparisons are interpolated
             op = entities['cgpa_operator']
-            val = entities['cgpa_value']
-            conditions.append(f"CGPA {op} {val}")
+            if op not in CGPA_OPERATORS:
+                raise ValueError(f"Unsupported CGPA comparison '{op}'")
+            conditions.append(f"CGPA {op} ?")
+            params.append(entities['cgpa_value'])
         
         if 'placed' in entities:
             if entities['placed']:
@@ -86,8 +182,60 @@ class SQLSystem:
         if conditions:
             base_query += " WHERE " + " AND ".join(conditions)
         
-        base_query += " LIMIT 50"  # Limit results
-        return base_query
+        base_query += f" LIMIT {int(limit)}"  # Limit results
+        return base_query, params
+    
+    def _placement_stats(self):
+        """Placement statistics across all placed students"""
+        try:
+            # Aggregate in SQLite instead of loading every placed student
+            total_placed, avg_cgpa = 0, None
+            branches, companies = [], []
+            for kind, label, count, avg in self._query(self.PLACEMENT_STATS_SQL)[0]:
+                if kind == 'total':
+                    total_placed, avg_cgpa = count, avg
+                elif kind == 'branch':
+                    branches.append((label, count))
+                else:
+                    companies.append(label)
+            
+            if total_placed == 0:
+                return "No placement data available in the database."
+            
+            # Calculate statistics
+            response = f"Placement Statistics (from Student DB):\n\n"
+            response += f"• Total students placed: {total_placed}\n"
+            
+            # Top companies
+            response += f"• Top recruiters: {', '.join(companies[:5])}\n"
+            
+            # Average CGPA
+            if avg_cgpa is not None:
+                response += f"• Average CGPA of placed students: {avg_cgpa:.2f}\n"
+            
+            # Branch-wise distribution
+            response += f"\nBranch-wise placement:\n"
+            for branch, count in branches:
+                response += f"  • {branch}: {count} students\n"
+            
+            return response.strip()
+        except Exception as e:
+            print(f"SQL Error in placement stats: {e}")
+            return f"Error fetching placement data: {e}"
+    
+    def _top_companies(self):
+        """Top recruiting companies by number of students placed"""
+        try:
+            rows, _ = self._query(self.TOP_COMPANIES_SQL)
+            if not rows:
+                return "No placement data available."
+            
+            response = "Top Recruiting Companies:\n\n"
+            for company, count in rows:
+                response += f"• {company}: {count} students\n"
+            return response
+        except Exception as e:
+            return f"Error fetching company data: {e}"
     
     def query_students(self, query):
         """
@@ -100,130 +248,105 @@ class SQLSystem:
         - "Find student named John Doe"
         - "How many students got placed?"
         """
+        # Case is kept in the key: roll numbers and names are matched on it
+        key = ' '.join(query.split())
+        with self._responses_lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+        
+        response = self._query_students(key)
+        if not response.startswith("Error"):  # Don't pin transient failures
+            with self._responses_lock:
+                self._responses[key] = response
+                if len(self._responses) > STUDENT_CACHE_SIZE:
+                    self._responses.popitem(last=False)
+        return response
+    
+    def _query_students(self, query):
+        """Answer a student query (uncached)"""
         query_lower = query.lower()
         
         # Special case: "how many students placed" - aggregate query
-        if 'how many' in query_lower and 'placed' in query_lower:
-            try:
-                # Get all placed students
-                df = pd.read_sql_query(
-                    """SELECT * FROM students 
-                       WHERE "COMPANY PLACED" IS NOT NULL AND "COMPANY PLACED" != 'Not Placed'""", 
-                    self.conn
-                )
-                
-                if len(df) == 0:
-                    return "No placement data available in the database."
-                
-                total_placed = len(df)
-                
-                # Calculate statistics
-                response = f"Placement Statistics (from Student DB):\n\n"
-                response += f"• Total students placed: {total_placed}\n"
-                
-                # Top companies
-                if not df['COMPANY PLACED'].empty:
-                    companies = df['COMPANY PLACED'].value_counts().head(5)
-                    response += f"• Top recruiters: {', '.join(companies.index.tolist())}\n"
-                
-                # Average CGPA
-                if 'CGPA' in df.columns and not df['CGPA'].isnull().all():
-                    avg_cgpa = df['CGPA'].mean()
-                    response += f"• Average CGPA of placed students: {avg_cgpa:.2f}\n"
-                
-                # Branch-wise distribution
-                if 'BRANCH' in df.columns:
-                    branch_counts = df['BRANCH'].value_counts().to_dict()
-                    response += f"\nBranch-wise placement:\n"
-                    for branch, count in sorted(branch_counts.items(), key=lambda x: x[1], reverse=True):
-                        response += f"  • {branch}: {count} students\n"
-                
-                return response.strip()
-            except Exception as e:
-                print(f"SQL Error in placement stats: {e}")
-                return f"Error fetching placement data: {e}"
+        if _PLACEMENT_STATS_RE.search(query_lower):
+            return self._placement_stats()
         
         # Special case: top companies query
-        query_lower = query.lower()
-        if 'companies' in query_lower or 'recruiter' in query_lower:
-            try:
-                df = pd.read_sql_query(
-                    """SELECT "COMPANY PLACED", COUNT(*) as count 
-                       FROM students 
-                       WHERE "COMPANY PLACED" IS NOT NULL AND "COMPANY PLACED" != 'Not Placed'
-                       GROUP BY "COMPANY PLACED"
-                       ORDER BY count DESC
-                       LIMIT 10""", 
-                    self.conn
-                )
-                if len(df) == 0:
-                    return "No placement data available."
-                
-                response = "Top Recruiting Companies:\n\n"
-                for _, row in df.iterrows():
-                    response += f"• {row['COMPANY PLACED']}: {row['count']} students\n"
-                return response
-            except Exception as e:
-                return f"Error fetching company data: {e}"
+        if _COMPANIES_RE.search(query_lower):
+            return self._top_companies()
         
         # Extract entities from query
-        entities = self.extract_entities(query)
+        entities = self.extract_entities(query, query_lower)
         
         if not entities:
             return "I couldn't understand the student query. Please specify student ID, name, department, or conditions."
         
+        # An unknown comparison is reported, not dropped (that would list every student)
+        op = entities.get('cgpa_operator')
+        if op is not None and op not in CGPA_OPERATORS:
+            return f"Unsupported CGPA comparison '{op}'. Please use >, <, >=, <= or =."
+        
         # Build SQL query
-        sql_query = self.build_sql_query(entities)
+        lookup = 'roll_no' in entities
+        sql_query, params = self.build_sql_query(entities, limit=1 if lookup else 50)
         
         try:
+            # PRIVACY: Individual records only for specific student lookup
+            if lookup:
+                # Specific student lookup - show limited details from a single row
+                rows, columns = self._query(sql_query, params, limit=1)
+                if not rows:
+                    return "No students found matching your criteria."
+                response = f"Student Information:\n"
+                for col, value in zip(columns, rows[0]):
+                    response += f"  {col}: {value}\n"
+                return response.strip()
+            
+            import pandas as pd
+            
             # Execute query
-            result_df = pd.read_sql_query(sql_query, self.conn)
+            result_df = self._read_frame(sql_query, params)
             
             if len(result_df) == 0:
                 return "No students found matching your criteria."
             
-            # PRIVACY: Only show aggregate data for general queries
-            # Individual records only for specific student lookup
-            if len(result_df) == 1 and 'roll_no' in entities:
-                # Specific student lookup - show limited details
-                student = result_df.iloc[0]
-                response = f"Student Information:\n"
-                safe_cols = ['NAME', 'BRANCH', 'CGPA', 'COMPANY PLACED']
-                for col in safe_cols:
-                    if col in result_df.columns:
-                        response += f"  {col}: {student[col]}\n"
-                return response.strip()
-            else:
-                # General query - show ONLY aggregate summary (PRIVACY)
-                total = len(result_df)
-                
-                # Calculate statistics
-                response = f"Summary ({total} students found):\n\n"
-                
-                # Placement stats
-                if 'COMPANY PLACED' in result_df.columns:
-                    placed = result_df[result_df['COMPANY PLACED'].notna() & (result_df['COMPANY PLACED'] != 'Not Placed')]
-                    response += f"• Placed students: {len(placed)} out of {total}\n"
-                    
-                    # Top companies
-                    if len(placed) > 0:
-                        companies = placed['COMPANY PLACED'].value_counts().head(3)
-                        response += f"• Top recruiters: {', '.join(companies.index.tolist())}\n"
-                
-                # CGPA stats
-                if 'CGPA' in result_df.columns:
-                    avg_cgpa = result_df['CGPA'].mean()
-                    max_cgpa = result_df['CGPA'].max()
-                    response += f"• Average CGPA: {avg_cgpa:.2f}\n"
-                    response += f"• Highest CGPA: {max_cgpa:.2f}\n"
-                
-                # Branch distribution
-                if 'BRANCH' in result_df.columns:
-                    branches = result_df['BRANCH'].value_counts().to_dict()
-                    response += f"• Branch-wise: {', '.join([f'{k}: {v}' for k, v in branches.items()])}\n"
+            # CGPA fits float32; branch/company are low-cardinality, so
+            # value_counts runs on integer category codes
+            result_df['CGPA'] = pd.to_numeric(result_df['CGPA'], downcast='float')
+            result_df['BRANCH'] = result_df['BRANCH'].astype('category')
+            result_df['COMPANY PLACED'] = result_df['COMPANY PLACED'].astype('category')
+            
+            # General query - show ONLY aggregate summary (PRIVACY)
+            total = len(result_df)
+            
+            # Calculate statistics
+            response = f"Summary ({total} students found):\n\n"
+            
+            # Placement stats
+            if 'COMPANY PLACED' in result_df.columns:
+                placed = result_df[result_df['COMPANY PLACED'].notna() & (result_df['COMPANY PLACED'] != 'Not Placed')]
+                response += f"• Placed students: {len(placed)} out of {total}\n"
                 
-                response += "\n(Individual student data is protected. Please contact administration for specific records.)"
-                return response
+                # Top companies
+                if len(placed) > 0:
+                    # Drop zero-count categories (e.g. 'Not Placed') before taking the top 3
+                    companies = placed['COMPANY PLACED'].cat.remove_unused_categories().value_counts().head(3)
+                    response += f"• Top recruiters: {', '.join(companies.index.tolist())}\n"
+            
+            # CGPA stats
+            if 'CGPA' in result_df.columns:
+                avg_cgpa = result_df['CGPA'].mean()
+                max_cgpa = result_df['CGPA'].max()
+                response += f"• Average CGPA: {avg_cgpa:.2f}\n"
+                response += f"• Highest CGPA: {max_cgpa:.2f}\n"
+            
+            # Branch distribution
+            if 'BRANCH' in result_df.columns:
+                branches = result_df['BRANCH'].value_counts().to_dict()
+                response += f"• Branch-wise: {', '.join([f'{k}: {v}' for k, v in branches.items()])}\n"
+            
+            response += "\n(Individual student data is protected. Please contact administration for specific records.)"
+            return response
         
         except Exception as e:
             return f"Error querying database: {str(e)}"
@@ -232,9 +355,17 @@ class SQLSystem:
         """Make class callable"""
         return self.query_students(query)
     
+    def refresh(self):
+        """Forget cached responses, e.g. after the student database is reloaded"""
+        with self._responses_lock:
+            self._responses.clear()
+    
     def close(self):
-        """Close database connection"""
-        self.conn.close()
+        """Close the database connection (reopened if the system is used again)"""
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
 if __name__ == "__main__":
     # Test the SQL system
@@ -1,8 +1,28 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+import importlib.util
 import re
 from typing import Dict, Any, Tuple, Optional, List
 
+# Prefer the C-backed lxml parser when installed (optional dependency)
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# Only build the nodes each page is read for: login pages need the form inputs,
+# the lnkStudent link and the lblMsg label; results pages need tables, the
+# hidden/semester inputs and semester links
+LOGIN_PAGE_TAGS = SoupStrainer(['input', 'a', 'span'])
+RESULTS_PAGE_TAGS = SoupStrainer(['table', 'input', 'a'])
+
+# Results page summary fields, found in a single scan; group name -> overall key
+_HEADER_RE = re.compile(r'Final CGPA\s*[:=]\s*(?P<cgpa>\d+\.?\d*)'
+                        r'|Total Credits\s*[:=]\s*(?P<credits>\d+\.?\d*)'
+                        r'|Due Subjects\s*[:=]\s*(?P<due>[0-9/]+)')
+_HEADER_FIELDS = {'cgpa': 'CGPA', 'credits': 'Total Credits', 'due': 'Due Subjects'}
+_SEMESTER_RE = re.compile(r'\b[IVX]+\s+YEAR\s+[IVX]+\s+SEM[EI]STER', re.IGNORECASE)
+_POSTBACK_RE = re.compile(r"__doPostBack\('([^']+)'")
+
 class AutonomousPortalScraper:
     """Scraper for TKRCET Autonomous portal (tkrcetautonomous.org) - ASP.NET"""
     
@@ -16,6 +36,11 @@ class AutonomousPortalScraper:
     def _convert_to_uppercase(self, text: str) -> str:
         return text.upper() if text else text
     
+    @staticmethod
+    def _hidden_fields(soup) -> Dict[str, Any]:
+        """ASP.NET postback state (__VIEWSTATE etc.) from the page's named hidden inputs"""
+        return {i["name"]: i.get("value") for i in soup.find_all("input", type="hidden") if i.get("name")}
+    
     def login(self, username: str, password: str) -> Tuple[bool, str]:
         """Login to autonomous portal (ASP.NET)"""
         try:
@@ -25,6 +50,13 @@ class AutonomousPortalScraper:
             print(f"  [Logging in to Autonomous Portal as: {username}]")
             
             self.session = requests.Session()
+            # Keep the portal connection alive across the login/results round-trips;
+            # transient 5xx on GETs are retried on the same pooled connection
+            # raise_on_status=False: once retries run out the last 5xx response is
+            # returned, so the status-code checks (alternate results URL, login errors) still run
+            retry = Retry(total=2, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504],
+                          raise_on_status=False)
+            self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
             self.session.headers.update({
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -42,30 +74,26 @@ class AutonomousPortalScraper:
                 print(f"  [Login Page Status: {response.status_code}]")
                 return False, f"Failed to load login page (Status: {response.status_code})"
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=LOGIN_PAGE_TAGS)
             
             # Step 1.5: Click "Student Login" if present
             lnkStudent = soup.find(id="lnkStudent")
             if lnkStudent:
                 print("  [Found 'Student Login' link. Clicking it...]")
-                payload = {}
-                for hidden in soup.find_all("input", type="hidden"):
-                    payload[hidden.get("name")] = hidden.get("value")
+                payload = self._hidden_fields(soup)
                 
                 payload["__EVENTTARGET"] = "lnkStudent"
                 payload["__EVENTARGUMENT"] = ""
                 
                 # Post click
                 response = self.session.post(self.login_url, data=payload, timeout=10)
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=LOGIN_PAGE_TAGS)
             
             # Step 2: Extract Login Fields
             if not soup.find("input", id="txtUserId"):
                  return False, "Could not find login fields (txtUserId). Check connection."
             
-            payload = {}
-            for hidden in soup.find_all("input", type="hidden"):
-                payload[hidden.get("name")] = hidden.get("value")
+            payload = self._hidden_fields(soup)
             
             payload["txtUserId"] = username
             payload["txtPwd"] = password
@@ -109,27 +137,21 @@ class AutonomousPortalScraper:
                  print(f"  [Retrying alternate URL: {target_url}]")
                  resp = self.session.get(target_url, timeout=15)
             
-            soup = BeautifulSoup(resp.text, 'html.parser')
+            soup = BeautifulSoup(resp.content, HTML_PARSER, parse_only=RESULTS_PAGE_TAGS)
             results_data = {"success": False, "results": [], "overall": {}}
             
             # --- EXTRACT HEADER INFO ---
-            full_text = soup.get_text()
-            cgpa_match = re.search(r'Final CGPA\s*[:=]\s*(\d+\.?\d*)', resp.text)
-            credits_match = re.search(r'Total Credits\s*[:=]\s*(\d+\.?\d*)', resp.text)
-            due_match = re.search(r'Due Subjects\s*[:=]\s*([0-9/]+)', resp.text)
-            
-            if cgpa_match: results_data["overall"]["CGPA"] = cgpa_match.group(1)
-            if credits_match: results_data["overall"]["Total Credits"] = credits_match.group(1)
-            if due_match: results_data["overall"]["Due Subjects"] = due_match.group(1)
+            for match in _HEADER_RE.finditer(resp.text):
+                # First occurrence of each field wins
+                results_data["overall"].setdefault(_HEADER_FIELDS[match.lastgroup], match.group(match.lastgroup))
             
             # --- SEMESTER SELECTION LOGIC ---
-            roman_pattern = re.compile(r'\b[IVX]+\s+YEAR\s+[IVX]+\s+SEM[EI]STER', re.IGNORECASE)
             sem_buttons = []
             
             # Scan INPUTS (type=submit/button)
             for inp in soup.find_all('input', type=['submit', 'button']):
                 val = inp.get('value', '').upper()
-                if roman_pattern.search(val):
+                if _SEMESTER_RE.search(val):
                     sem_buttons.append({
                         "text": val,
                         "name": inp.get('name'),
@@ -140,7 +162,7 @@ class AutonomousPortalScraper:
             if not sem_buttons:
                 for a in soup.find_all('a', href=True):
                     text = a.get_text(strip=True).upper()
-                    if roman_pattern.search(text):
+                    if _SEMESTER_RE.search(text):
                          sem_buttons.append({"text": text, "href": a['href'], "element": a})
 
             if sem_buttons:
@@ -149,21 +171,19 @@ class AutonomousPortalScraper:
                 print(f"  [Selecting Latest: {chosen_btn['text']}]")
                 
                 # Perform Click / PostBack
-                payload = {}
-                for hidden in soup.find_all("input", type="hidden"):
-                     payload[hidden.get("name")] = hidden.get("value")
+                payload = self._hidden_fields(soup)
                 
                 if "name" in chosen_btn:
                      payload[chosen_btn["name"]] = chosen_btn["element"].get("value")
                 elif "href" in chosen_btn:
-                     match = re.search(r"__doPostBack\('([^']+)'", chosen_btn['href'])
+                     match = _POSTBACK_RE.search(chosen_btn['href'])
                      if match:
                          payload["__EVENTTARGET"] = match.group(1)
                          payload["__EVENTARGUMENT"] = ""
                 
                 print(f"  [Posting selection for {chosen_btn['text']}...]")
                 resp = self.session.post(target_url, data=payload, timeout=15)
-                soup = BeautifulSoup(resp.text, 'html.parser')
+                soup = BeautifulSoup(resp.content, HTML_PARSER, parse_only=RESULTS_PAGE_TAGS)
 
             else:
                 print("  [No specific semester buttons found. Assuming latest results displayed.]")
@@ -187,7 +207,7 @@ class AutonomousPortalScraper:
                 
                 # Data Rows
                 for tr in target_table.find_all("tr"):
-                    if tr == header_row: continue 
+                    if tr is header_row: continue 
                     cells = [td.get_text(strip=True) for td in tr.find_all("td")]
                     if len(cells) >= 5 and "Subject" not in cells[2]: 
                         rows.append(cells)
@@ -3,20 +3,19 @@ Multi-Language Support for College Chatbot
 Supports Telugu and Hindi translation
 """
 
+import re
 from typing import Tuple
 
+# Any character from the script's Unicode block identifies the language
+TELUGU_RE = re.compile('[\u0C00-\u0C7F]')
+HINDI_RE = re.compile('[\u0900-\u097F]')  # Devanagari
+
 
 class Translator:
     """Simple translation system for Telugu and Hindi"""
     
     def __init__(self):
         """Initialize translator"""
-        # Common Telugu keywords
-        self.telugu_keywords = ['ఎవరు', 'ఏమిటి', 'ఎక్కడ', 'ఎప్పుడు', 'ఎలా', 'కాలేజీ', 'ప్రిన్సిపాల్']
-        
-        # Common Hindi keywords  
-        self.hindi_keywords = ['कौन', 'क्या', 'कहाँ', 'कब', 'कैसे', 'कॉलेज', 'प्रिंसिपल']
-        
         # Basic translation dictionaries (expandable)
         self.telugu_to_english = {
             'ప్రిన్సిపాల్ ఎవరు': 'who is the principal',
@@ -29,15 +28,24 @@ class Translator:
             'कॉलेज कहाँ है': 'where is the college',
             'फीस कितनी है': 'what are the fees',
         }
+        
+        # One alternation per dictionary so a query is scanned once, however
+        # many phrases there are (longest first, so it wins at a shared start)
+        self._telugu_re = self._phrase_regex(self.telugu_to_english)
+        self._hindi_re = self._phrase_regex(self.hindi_to_english)
+    
+    @staticmethod
+    def _phrase_regex(phrases):
+        return re.compile('|'.join(map(re.escape, sorted(phrases, key=len, reverse=True))))
     
     def detect_language(self, text: str) -> str:
         """Detect language of input text"""
         # Check for Telugu
-        if any(char in text for char in self.telugu_keywords):
+        if TELUGU_RE.search(text):
             return 'telugu'
         
         # Check for Hindi
-        if any(char in text for char in self.hindi_keywords):
+        if HINDI_RE.search(text):
             return 'hindi'
         
         # Default to English
@@ -47,18 +55,18 @@ class Translator:
         """Translate query to English for processing"""
         if source_lang == 'telugu':
             # Check dictionary first
-            for telugu, english in self.telugu_to_english.items():
-                if telugu in text:
-                    return english
+            match = self._telugu_re.search(text)
+            if match:
+                return self.telugu_to_english[match.group(0)]
             
             # Fallback: use Google Translate API or return as-is
             return text
         
         elif source_lang == 'hindi':
             # Check dictionary first
-            for hindi, english in self.hindi_to_english.items():
-                if hindi in text:
-                    return english
+            match = self._hindi_re.search(text)
+            if match:
+                return self.hindi_to_english[match.group(0)]
             
             # Fallback: use Google Translate API or return as-is
             return text
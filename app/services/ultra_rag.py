@@ -3,111 +3,213 @@ UltraRAG System - Modern MCP-based RAG implementation
 Replaces the old custom RAG system with UltraRAG framework
 """
 
+import importlib.util
 import json
+import mmap
+import os
+import re
 import requests
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+from app.services.knowledge_base import GREETINGS, KNOWLEDGE_BASE, any_of  # KB/GREETINGS re-exported for existing importers
+
+# Retrieval backends, imported once here rather than inside per-query methods.
+# Optional at import time so the module's constants stay importable without
+# them; UltraRAGSystem itself needs faiss.
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    import bm25s  # Sparse BM25 scoring (falls back to rank_bm25)
+except ImportError:
+    bm25s = None
+
+# Optional: parse the corpus with orjson (falls back to stdlib json; both accept bytes)
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 # Fix Windows encoding
 if sys.platform.startswith('win'):
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 
-# ============================================================
-# KNOWLEDGE BASE - Instant answers for critical facts
-# ============================================================
-KNOWLEDGE_BASE = {
-    "personnel": {
-        "principal": "Dr. D. V. Ravi Shankar",
-        "vice_principal": "Dr. A. Suresh Rao (also HoD of CSE & Dean Academics)",
-        "secretary": "Dr. T. Harinath Reddy",
-        "chairman": "Sri. Teegala Krishna Reddy",
-        "hod": {
-            "cse": "Dr. A. Suresh Rao",
-            "cse-aiml": "Dr. B. Sunil Srinivas",
-            "csm": "Dr. B. Sunil Srinivas",
-            "cse-ds": "Dr. V. Krishna",
-            "csd": "Dr. V. Krishna",
-            "ece": "Dr. D. Nageshwar Rao",
-            "eee": "Dr. K. Raju",
-            "it": "Dr. R. Muruanantham",
-            "mech": "Mr. D. Rushi Kumar",
-            "civil": "Mr. K.V.R Satya Sai",
-            "mba": "Dr. K. Gyaneswari"
-        }
-    },
-    "timings": {
-        "working_hours": "9:40 AM to 4:20 PM (Monday-Saturday)",
-        "lunch_break": "12:40 PM to 1:20 PM"
-    },
-    "history": {
-        "established": "2002",
-        "founder": "Sri. Teegala Krishna Reddy",
-        "affiliation": "JNTUH (Jawaharlal Nehru Technological University Hyderabad)",
-        "location": "Meerpet, Hyderabad - 500097, Telangana",
-        "campus_size": "20 acres"
-    },
-    "admissions": {
-        "process": "Admissions are through TS EAPCET counseling for B.Tech, PGCET for M.Tech, and direct admission for MBA. Visit the admissions office or website for detailed procedure.",
-        "eligibility": "10+2 with Physics, Chemistry, and Mathematics for B.Tech. Graduation in relevant field for M.Tech/MBA.",
-        "contact": "Visit https://tkrcet.ac.in/admissions for admission details and fee structure."
-    },
-    "courses": {
-        "ug": ["CSE", "CSE-AIML", "CSE-DS", "ECE", "EEE", "IT", "Mechanical", "Civil"],
-        "pg": ["M.Tech in CSE", "M.Tech in Power Electronics", "MBA"],
-        "total": "8 UG programs and 3 PG programs"
-    },
-    "facilities": {
-        "main": "State-of-the-art labs, smart classrooms, Wi-Fi campus, digital library, hostel (boys & girls), transport, sports ground, auditorium, NCC, incubation center, and medical facilities.",
-        "special": "Virtual labs, R&D center (21,000 sq ft), industry partnerships with ECIL and others."
-    },
-    "accreditation": {
-        "naac": "A+ Grade",
-        "nba": "NBA Accredited",
-        "approvals": "AICTE approved, UGC recognized 2(f) & 12(B)"
-    },
-    "scholarships": {
-        "types": ["Merit-based", "Need-based", "Sports quota", "SC/ST/OBC", "Minority scholarships"],
-        "merit": "Available for students with >85% in 12th or CGPA >8.5 in college",
-        "fee_reimbursement": "TS Government fee reimbursement scheme for eligible students (income criteria apply)",
-        "central_schemes": "Central sector scholarship, Post-matric scholarship for SC/ST/OBC students",
-        "contact": "Contact admissions office or visit https://tkrcet.ac.in/scholarships for details",
-        "application": "Apply through TS ePass portal for state scholarships"
-    },
-    "fees": {
-        "btech_annual": "₹75,000 - ₹85,000 per year (approx, varies by category)",
-        "mtech_annual": "₹60,000 - ₹70,000 per year (approx)",
-        "mba_annual": "₹50,000 - ₹60,000 per year (approx)",
-        "hostel": "₹40,000 - ₹50,000 per year (including mess)",
-        "transport": "₹15,000 - ₹25,000 per year (route-dependent)",
-        "note": "Fees vary by category (Management/Convener quota). Contact admissions for exact details: admissions@tkrcet.ac.in"
-    },
-    "events": {
-        "tech_fest": "Annual tech fest 'TECHNOVA' with coding competitions, robotics, hackathons, and technical workshops",
-        "cultural_fest": "Cultural fest 'KALANJALI' with music, dance, drama, and art competitions",
-        "sports_day": "Annual sports meet with inter-department cricket, football, volleyball, and athletics",
-        "hackathons": "Regular 24-hour coding hackathons and coding competitions",
-        "workshops": "Industry expert workshops on AI/ML, Cloud Computing, IoT, and emerging technologies",
-        "clubs": "Active IEEE, CSI, Coding Club, Robotics Club, and Literary Club"
-    },
-    "exam_schedule": {
-        "mid_term_1": "Usually in September (Odd semester) / February (Even semester)",
-        "mid_term_2": "Usually in November (Odd semester) / April (Even semester)",
-        "semester_end": "December (Odd semester) / May (Even semester)",
-        "internal_marks": "Based on mid-terms, assignments, and attendance",
-        "note": "Check college website or notice board for exact dates each semester"
-    },
-    "library": {
-        "name": "Central Library",
-        "collection": "50,000+ books, e-journals, IEEE digital library access",
-        "timings": "9:00 AM to 5:00 PM (Monday-Saturday)",
-        "facilities": "Digital library, reading rooms, e-resources, internet access",
-        "membership": "Free for all students and faculty"
-    }
+# Sentence embedding model shared by every component in the process
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+_EMBEDDING_MODELS = {}
+# On CPU, prefer the int8 dynamic-quantized ONNX export published with the model
+# (needs onnxruntime and sentence-transformers>=3.2; falls back to PyTorch)
+ONNX_INT8_FILE = 'onnx/model_qint8_avx512_vnni.onnx'
+# PyTorch encoder is wrapped with torch.compile (torch>=2.0) and kept only if a
+# warm-up encode succeeds (the inductor backend needs a working C++ compiler)
+COMPILE_ENCODER = True
+
+# Approximate FAISS search: HNSW graph (int8 vectors) up to this many documents, IVF-PQ beyond
+HNSW_MAX_DOCS = 50000
+HNSW_M = 32                 # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16             # Inverted lists scanned per query
+
+INDEX_ENCODE_CHUNK = 4096   # Documents encoded per call when building the index
+
+# Query-time encode: one padded batch, no tqdm bar (shown by default at INFO logging)
+QUERY_ENCODE_BATCH_SIZE = 32
+ANSWER_SOFT_LIMIT = 200  # chars; short answers stop at the next sentence end after this
+# A trailing '.' that does not end a sentence: titles, degree names, digits ("8." + "5")
+_NOT_SENTENCE_END_RE = re.compile(r'(?:\b(?:Dr|Prof|Mr|Mrs|Ms|B\.Tech|M\.Tech)|\d)\.$', re.IGNORECASE)
+
+# Start of the document-snippet answer given when Ollama is down or still warming up
+SNIPPET_FALLBACK_PREFIX = "Here's what I found:"
+
+# LRU bounds for repeat queries (keyed by lowercased, whitespace-collapsed text)
+RETRIEVAL_CACHE_SIZE = 1024  # (query, top_k) -> retrieved docs
+RESPONSE_CACHE_SIZE = 512    # query -> generated answer
+
+
+# Scope check (_is_college_related) keyword groups, compiled once at import
+COLLEGE_KEYWORDS_RE = any_of([
+    'college', 'tkrcet', 'university', 'campus', 'admission', 'course', 'department',
+    'principal', 'hod', 'dean', 'faculty', 'professor', 'teacher', 'staff',
+    'fee', 'placement', 'hostel', 'library', 'lab', 'facility', 'infrastructure',
+    'exam', 'semester', 'academic', 'student', 'class', 'lecture', 'timing',
+    'branch', 'cse', 'ece', 'eee', 'mech', 'civil', 'mba', 'btech', 'mtech',
+    'naac', 'nba', 'aicte', 'jntuh', 'affiliation', 'accreditation',
+    'transport', 'canteen', 'sports', 'club', 'event', 'fest', 'workshop',
+    'scholarship', 'eligibility', 'criteria', 'counseling', 'eapcet'
+])
+COLLEGE_PATTERNS_RE = any_of([
+    'where is', 'when was', 'who is', 'what are', 'how to',
+    'tell me about', 'information about', 'details about'
+])
+NON_COLLEGE_RE = any_of([
+    'formula', 'equation', 'calculate', 'solve', 'math', 'physics',
+    'chemistry', 'biology', 'theorem', 'proof', '^', '=', '+', '-', '*', '/'
+])
+
+# Knowledge-base trigger keyword -> topic. One scan reports every keyword in
+# the query (overlapping ones too, via the lookahead); _check_knowledge_base
+# then answers the highest-priority topic present.
+KB_TRIGGERS = {
+    'vice principal': 'vice_principal', 'vice': 'vice', 'principal': 'principal',
+    'secretary': 'secretary', 'chairman': 'chairman',
+    'hod': 'hod', 'head of department': 'hod',
+    'timing': 'timings', 'hours': 'timings', 'time': 'timings',
+    'established': 'history', 'founded': 'history', 'started': 'history',
+    'affiliation': 'affiliation', 'affiliated': 'affiliation',
+    'location': 'location', 'address': 'location', 'where': 'location',
+    'admission': 'admissions', 'apply': 'admissions', 'join': 'admissions',
+    'course': 'courses', 'program': 'courses', 'branch': 'courses', 'department': 'courses',
+    'facilit': 'facilities', 'infrastructure': 'facilities', 'amenities': 'facilities',
+    'naac': 'accreditation', 'nba': 'accreditation', 'accredit': 'accreditation', 'approved': 'accreditation',
 }
+KB_TRIGGER_RE = re.compile(
+    '(?=(' + '|'.join(map(re.escape, sorted(KB_TRIGGERS, key=len, reverse=True))) + '))'
+)
+
+# Knowledge-base answers and prompt context never change at runtime, so they
+# are formatted once here instead of on every query
+KB_ANSWERS = {
+    'principal': f"The Principal of TKRCET is {KNOWLEDGE_BASE['personnel']['principal']}.",
+    'vice_principal': f"The Vice Principal is {KNOWLEDGE_BASE['personnel']['vice_principal']}.",
+    'secretary': f"The Secretary of TKRCET is {KNOWLEDGE_BASE['personnel']['secretary']}.",
+    'chairman': f"The Chairman of TKRCET is {KNOWLEDGE_BASE['personnel']['chairman']}.",
+    'timings': f"College timings: {KNOWLEDGE_BASE['timings']['working_hours']}. Lunch break: {KNOWLEDGE_BASE['timings']['lunch_break']}.",
+    'history': f"TKRCET was established in {KNOWLEDGE_BASE['history']['established']} on a {KNOWLEDGE_BASE['history']['campus_size']} campus in {KNOWLEDGE_BASE['history']['location']}.",
+    'affiliation': f"TKRCET is affiliated to {KNOWLEDGE_BASE['history']['affiliation']}.",
+    'location': f"TKRCET is located at {KNOWLEDGE_BASE['history']['location']}.",
+    'admissions': f"{KNOWLEDGE_BASE['admissions']['process']} Eligibility: {KNOWLEDGE_BASE['admissions']['eligibility']} {KNOWLEDGE_BASE['admissions']['contact']}",
+    'courses': (
+        f"TKRCET offers {KNOWLEDGE_BASE['courses']['total']}.\n\n"
+        f"UG Programs: {', '.join(KNOWLEDGE_BASE['courses']['ug'])}\n\n"
+        f"PG Programs: {', '.join(KNOWLEDGE_BASE['courses']['pg'])}"
+    ),
+    'facilities': f"{KNOWLEDGE_BASE['facilities']['main']}\n\nSpecial Features: {KNOWLEDGE_BASE['facilities']['special']}",
+    'accreditation': f"TKRCET is {KNOWLEDGE_BASE['accreditation']['naac']} accredited, {KNOWLEDGE_BASE['accreditation']['nba']}, and {KNOWLEDGE_BASE['accreditation']['approvals']}.",
+}
+KB_HOD_ANSWERS = {
+    dept: f"The HOD of {dept.upper()} is {hod}." for dept, hod in KNOWLEDGE_BASE['personnel']['hod'].items()
+}
+KB_CONTEXT = "\n".join([
+    f"Principal: {KNOWLEDGE_BASE['personnel']['principal']}",
+    f"Vice Principal: {KNOWLEDGE_BASE['personnel']['vice_principal']}",
+    f"Timings: {KNOWLEDGE_BASE['timings']['working_hours']}",
+    f"Established: {KNOWLEDGE_BASE['history']['established']}",
+    f"Affiliation: {KNOWLEDGE_BASE['history']['affiliation']}",
+])
+
+
+def get_device():
+    """'cuda' when a GPU is usable by torch, else 'cpu'"""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return 'cuda'
+    except ImportError:
+        pass
+    return 'cpu'
 
 
+def get_embedding_model(name=EMBEDDING_MODEL_NAME):
+    """Load a SentenceTransformer once per process and return the shared instance"""
+    model = _EMBEDDING_MODELS.get(name)
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        device = get_device()
+        if device == 'cpu' and importlib.util.find_spec('onnxruntime'):
+            try:
+                model = SentenceTransformer(
+                    name, device=device, backend='onnx', model_kwargs={'file_name': ONNX_INT8_FILE}
+                )
+                print("✓ Using int8 ONNX sentence encoder")
+            except Exception as e:
+                print(f"⚠ int8 ONNX encoder unavailable, using PyTorch: {e}")
+        if model is None:
+            _tune_torch_threads()
+            model = SentenceTransformer(name, device=device)
+            if COMPILE_ENCODER:
+                _compile_encoder(model)
+        _EMBEDDING_MODELS[name] = model
+    return model
+
+
+def _tune_torch_threads():
+    """Use every core for CPU encoding when torch came up single-threaded (and OMP_NUM_THREADS is unset)"""
+    import torch
+    
+    cpus = os.cpu_count() or 1
+    if 'OMP_NUM_THREADS' not in os.environ and torch.get_num_threads() == 1 and cpus > 1:
+        torch.set_num_threads(cpus)
+        print(f"✓ PyTorch using {cpus} threads")
+
+
+def _compile_encoder(model):
+    """torch.compile the transformer inside a SentenceTransformer in place; left eager if compiling fails"""
+    import torch
+    
+    if not hasattr(torch, 'compile'):
+        return
+    transformer = model[0]
+    eager = transformer.auto_model
+    try:
+        # dynamic=True: batch size and sequence length vary per call
+        transformer.auto_model = torch.compile(eager, dynamic=True)
+        model.encode(["warm-up"], show_progress_bar=False)  # Compilation happens on the first call
+        print("✓ Compiled sentence encoder")
+    except Exception as e:
+        transformer.auto_model = eager
+        print(f"⚠ torch.compile unavailable, using eager encoder: {e}")
+
 
 class UltraRAGSystem:
     """
@@ -120,6 +222,7 @@ class UltraRAGSystem:
         corpus_path='app/database/vectordb/corpus_ultrarag.jsonl',
         ollama_model='gemma2:2b',  # Switched to 2B for 2x faster inference
         ollama_url='http://localhost:11434/api/generate',
+        embedding_model=None,
     ):
         print("Initializing UltraRAG System...")
         
@@ -133,16 +236,22 @@ class UltraRAGSystem:
         
         # Initialize retrieval components
         try:
-            from sentence_transformers import SentenceTransformer
-            from rank_bm25 import BM25Okapi
-            import faiss
-            import numpy as np
+            if faiss is None:
+                raise ImportError("faiss is required for UltraRAG retrieval (pip install faiss-cpu)")
+            
+            # Dense dedup key per document: index of the first document with the same id
+            first_by_id = {}
+            self._dedup_key = np.fromiter(
+                (first_by_id.setdefault(doc['id'], i) for i, doc in enumerate(self.documents)),
+                dtype=np.int64, count=len(self.documents)
+            )
             
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Reuse a caller-provided / process-wide model instead of loading another copy
+            self.embedding_model = embedding_model if embedding_model is not None else get_embedding_model()
             print("✓ Loaded embedding model")
             
             # Build/load FAISS index
-            self.index = self._build_faiss_index()
+            self.index = self._to_gpu(self._build_faiss_index())
             print("✓ FAISS index ready")
             
             # Build/load BM25 index
@@ -153,73 +262,187 @@ class UltraRAGSystem:
             print(f"⚠ Error initializing retrieval: {e}")
             raise
         
-        # Test Ollama connection
-        self.ollama_available = self._test_ollama()
+        # BM25 scoring runs here while the calling thread encodes + searches FAISS
+        self._bm25_pool = ThreadPoolExecutor(max_workers=1)
+        
+        # One keep-alive HTTP session for all Ollama calls (thread-safe for the batch pool)
+        self._session = requests.Session()
+        self._session.headers.update({'Connection': 'keep-alive'})
         
-        # Response cache for common queries
-        self.response_cache = {}
+        # Test Ollama connection in the background: the probe is a real generation,
+        # so a cold model load would otherwise block startup. Queries made before
+        # it finishes still try Ollama and fall back to snippets on error.
+        self.ollama_available = False
+        self.ollama_ready = threading.Event()  # Set once the probe has finished
+        threading.Thread(target=self._warm_up_ollama, daemon=True).start()
+        
+        # LRU caches for repeat queries; retrieval and generation run on
+        # several threads (batch, Flask workers), so access is locked
+        self.retrieval_cache = OrderedDict()
+        self.response_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         print("✓ UltraRAG System ready!\n")
     
     def _load_corpus(self):
-        """Load JSONL corpus"""
+        """
+        Load JSONL corpus
+        
+        The file is memory-mapped and full document text is not kept in the
+        document dicts (only index building needs it - see _doc_text); each
+        doc remembers the byte span of its line instead.
+        """
+        with open(self.corpus_path, 'rb') as f:
+            self._corpus_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
         documents = []
-        with open(self.corpus_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                doc = json.loads(line)
+        data = self._corpus_map
+        start = 0
+        while start < len(data):
+            end = data.find(b'\n', start)
+            if end == -1:
+                end = len(data)
+            line = data[start:end]
+            if line.strip():
+                doc = json_loads(line)
+                # Prompt bullet and link are derived once here; retrieval hands out these same dicts
+                doc['bullet'] = f"• {doc.pop('contents')[:400]}"
+                doc['link'] = self._doc_link(doc)
+                doc['span'] = (start, end)
                 documents.append(doc)
+            start = end + 1
         return documents
     
+    def _doc_text(self, doc):
+        """Full text of a corpus document, read back from the memory-mapped file"""
+        start, end = doc['span']
+        return json_loads(self._corpus_map[start:end])['contents']
+    
+    @staticmethod
+    def _doc_link(doc):
+        """Navigation link for a corpus document ('' if it has no http URL)"""
+        url = doc.get('metadata', {}).get('url', '')
+        source = doc.get('metadata', {}).get('source', '')
+        
+        # Prefer source over url field
+        link = source if source and source.startswith('http') else url
+        return link if link and link.startswith('http') else ''
+    
     def _build_faiss_index(self):
         """Build or load FAISS index"""
-        import faiss
-        import numpy as np
-        
-        index_path = Path('app/database/vectordb/ultrarag_faiss.index')
+        # Documents and queries must be embedded by the same encoder, so an
+        # index built with a different backend (e.g. onnx) gets its own file.
+        # (The old exact IndexFlatL2 lived in ultrarag_faiss.index.)
+        backend = getattr(self.embedding_model, 'backend', 'torch')
+        suffix = '' if backend == 'torch' else f'_{backend}'
+        index_path = Path(f'app/database/vectordb/ultrarag_ann{suffix}.index')
         
         if index_path.exists():
-            return faiss.read_index(str(index_path))
+            # Memory-mapped where the index type supports it (inverted lists),
+            # so a restart pages data in on demand instead of reading it all
+            index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            return self._tune_faiss_search(index)
         
         # Build new index
         print("Building FAISS index...")
-        texts = [doc['contents'] for doc in self.documents]
-        embeddings = self.embedding_model.encode(texts, convert_to_tensor=True, show_progress_bar=True)
-        embeddings_np = embeddings.cpu().detach().numpy().astype(np.float32)
-        
-        index = faiss.IndexFlatL2(embeddings_np.shape[1])
+        # Unit vectors + inner product = cosine similarity, scored as a BLAS dot product.
+        # numpy output directly (no tensor -> cpu -> numpy copy); normalised inside the library.
+        # Encoded a chunk at a time into float16 storage, so the corpus text and
+        # float32 output are never all held at once. Documents go through in
+        # order of corpus line length (a free proxy for token count), so each
+        # chunk - and each padded batch inside it - holds similar lengths;
+        # rows are scattered back to document order.
+        num_docs = len(self.documents)
+        dim = self.embedding_model.get_sentence_embedding_dimension()
+        embeddings = np.empty((num_docs, dim), dtype=np.float16)
+        order = np.argsort([end - start for start, end in (doc['span'] for doc in self.documents)], kind='stable')
+        for start in range(0, num_docs, INDEX_ENCODE_CHUNK):
+            rows = order[start:start + INDEX_ENCODE_CHUNK]
+            texts = [self._doc_text(self.documents[i]) for i in rows]
+            embeddings[rows] = self.embedding_model.encode(
+                texts, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+            )
+            print(f"  Encoded {start + len(texts)}/{num_docs} documents")
+        embeddings_np = embeddings.astype(np.float32)  # FAISS trains and adds float32
+        
+        if num_docs < HNSW_MAX_DOCS:
+            # Graph over 8-bit scalar-quantized vectors: 4x smaller than float32 storage
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.train(embeddings_np)  # Learns the per-dimension quantization ranges
+        else:
+            # Large corpus: coarse quantizer + product-quantized codes (needs training)
+            nlist = min(4096, 4 * int(np.sqrt(num_docs)))
+            sub_quantizers = 64 if dim % 64 == 0 else next(m for m in (48, 32, 16, 8) if dim % m == 0)
+            index = faiss.IndexIVFPQ(
+                faiss.IndexFlatIP(dim), dim, nlist, sub_quantizers, 8, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(embeddings_np)
         index.add(embeddings_np)
         
         # Save index
         faiss.write_index(index, str(index_path))
+        return self._tune_faiss_search(index)
+    
+    def _to_gpu(self, index):
+        """Replicate the index onto all GPUs when faiss-gpu sees any (else keep the CPU index)"""
+        try:
+            num_gpus = faiss.get_num_gpus()
+            if num_gpus > 0:
+                gpu_index = faiss.index_cpu_to_all_gpus(index)
+                print(f"✓ FAISS index on {num_gpus} GPU(s)")
+                return gpu_index
+        except Exception as e:
+            # CPU-only faiss build, or an index type without a GPU version (HNSW)
+            print(f"⚠ FAISS GPU not used: {e}")
+        return index
+    
+    def _tune_faiss_search(self, index):
+        """Set query-time search breadth for approximate indexes (flat indexes are left as-is)"""
+        if hasattr(index, 'hnsw'):
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+        elif hasattr(index, 'nprobe'):
+            index.nprobe = IVF_NPROBE
         return index
     
     def _build_bm25_index(self):
-        """Build or load BM25 index"""
-        from rank_bm25 import BM25Okapi
-        import pickle
-        
-        bm25_path = Path('app/database/vectordb/ultrarag_bm25.pkl')
-        
-        if bm25_path.exists():
-            with open(bm25_path, 'rb') as f:
-                return pickle.load(f)
-        
-        # Build new BM25 index
-        print("Building BM25 index...")
-        corpus = [doc['contents'] for doc in self.documents]
-        tokenized_corpus = [doc.lower().split() for doc in corpus]
-        bm25 = BM25Okapi(tokenized_corpus)
+        """Build or load BM25 index (bm25s sparse scorer if installed, else rank_bm25)"""
+        if bm25s is not None:
+            # Eager sparse scoring: a query only touches its own terms' postings
+            self.bm25_backend = 'bm25s'
+            bm25s_dir = Path('app/database/vectordb/ultrarag_bm25s')
+            
+            if bm25s_dir.exists():
+                # Sparse score matrix is memory-mapped: opened, not read, and paged in on demand
+                return bm25s.BM25.load(str(bm25s_dir), mmap=True)
+            
+            print("Building BM25 index...")
+            corpus = [self._doc_text(doc) for doc in self.documents]
+            bm25 = bm25s.BM25(backend="auto")  # numba backend when available
+            bm25.index(bm25s.tokenize(corpus, stopwords="en", show_progress=False), show_progress=False)
+            
+            # Save index (numpy arrays + vocab/params JSON, no pickle)
+            bm25.save(str(bm25s_dir))
+            return bm25
         
-        # Save index
-        with open(bm25_path, 'wb') as f:
-            pickle.dump(bm25, f)
+        from rank_bm25 import BM25Okapi
         
-        return bm25
+        # Fallback scorer is rebuilt in memory each start: no pickle to load
+        # (or trust), and tokenising the corpus takes well under a second
+        self.bm25_backend = 'rank_bm25'
+        print("Building BM25 index (rank_bm25)...")
+        corpus = [self._doc_text(doc) for doc in self.documents]
+        return BM25Okapi([doc.lower().split() for doc in corpus])
+    
+    def _warm_up_ollama(self):
+        """Background connection test; also loads the model in Ollama ahead of the first query"""
+        self.ollama_available = self._test_ollama()
+        self.ollama_ready.set()
     
     def _test_ollama(self):
         """Test Ollama connection"""
         try:
-            response = requests.post(
+            response = self._session.post(
                 self.ollama_url,
                 json={"model": self.ollama_model, "prompt": "test", "stream": False},
                 timeout=30
@@ -231,132 +454,153 @@ class UltraRAGSystem:
             print(f"⚠ Ollama not available: {e}")
         return False
     
-    def _is_college_related(self, query):
-        """Check if query is related to college/education domain"""
-        query_lower = query.lower()
-        
-        # College-related keywords
-        college_keywords = [
-            'college', 'tkrcet', 'university', 'campus', 'admission', 'course', 'department',
-            'principal', 'hod', 'dean', 'faculty', 'professor', 'teacher', 'staff',
-            'fee', 'placement', 'hostel', 'library', 'lab', 'facility', 'infrastructure',
-            'exam', 'semester', 'academic', 'student', 'class', 'lecture', 'timing',
-            'branch', 'cse', 'ece', 'eee', 'mech', 'civil', 'mba', 'btech', 'mtech',
-            'naac', 'nba', 'aicte', 'jntuh', 'affiliation', 'accreditation',
-            'transport', 'canteen', 'sports', 'club', 'event', 'fest', 'workshop',
-            'scholarship', 'eligibility', 'criteria', 'counseling', 'eapcet'
-        ]
+    def _is_college_related(self, query_lower):
+        """Check if query is related to college/education domain (expects a lowercased query)"""
         
-        # Check if any college keyword is present
-        if any(keyword in query_lower for keyword in college_keywords):
+        # College keywords / question patterns / non-college topics: one precompiled pass each
+        if COLLEGE_KEYWORDS_RE.search(query_lower):
             return True
         
-        # Check for question patterns that are likely college-related
-        college_patterns = [
-            'where is', 'when was', 'who is', 'what are', 'how to',
-            'tell me about', 'information about', 'details about'
-        ]
-        
         # If it's a question pattern, check if it could be college-related
-        if any(pattern in query_lower for pattern in college_patterns):
+        if COLLEGE_PATTERNS_RE.search(query_lower):
             # Reject obvious non-college topics
-            non_college_keywords = [
-                'formula', 'equation', 'calculate', 'solve', 'math', 'physics',
-                'chemistry', 'biology', 'theorem', 'proof', '^', '=', '+', '-', '*', '/'
-            ]
-            if any(keyword in query_lower for keyword in non_college_keywords):
+            if NON_COLLEGE_RE.search(query_lower):
                 return False
             # If it's a question but no clear non-college indicators, allow it
             return True
         
         return False
     
-    def _check_knowledge_base(self, query):
-        """Check if query can be answered from knowledge base"""
-        query_lower = query.lower()
-        
-        # Personnel queries
-        if 'principal' in query_lower and 'vice' not in query_lower:
-            return f"The Principal of TKRCET is {KNOWLEDGE_BASE['personnel']['principal']}."
+    def _check_knowledge_base(self, query_lower):
+        """Check if query can be answered from knowledge base (expects a lowercased query)"""
         
-        if 'vice principal' in query_lower:
-            return f"The Vice Principal is {KNOWLEDGE_BASE['personnel']['vice_principal']}."
+        topics = {KB_TRIGGERS[keyword] for keyword in KB_TRIGGER_RE.findall(query_lower)}
+        if not topics:
+            return None
         
-        if 'secretary' in query_lower:
-            return f"The Secretary of TKRCET is {KNOWLEDGE_BASE['personnel']['secretary']}."
+        # Personnel queries
+        if 'principal' in topics and not topics & {'vice', 'vice_principal'}:
+            return KB_ANSWERS['principal']
         
-        if 'chairman' in query_lower:
-            return f"The Chairman of TKRCET is {KNOWLEDGE_BASE['personnel']['chairman']}."
+        for topic in ('vice_principal', 'secretary', 'chairman'):
+            if topic in topics:
+                return KB_ANSWERS[topic]
         
-        if 'hod' in query_lower or 'head of department' in query_lower:
-            for dept, hod in KNOWLEDGE_BASE['personnel']['hod'].items():
+        if 'hod' in topics:
+            for dept, answer in KB_HOD_ANSWERS.items():
                 if dept in query_lower:
-                    return f"The HOD of {dept.upper()} is {hod}."
-        
-        # Timings
-        if 'timing' in query_lower or 'hours' in query_lower or 'time' in query_lower:
-            return f"College timings: {KNOWLEDGE_BASE['timings']['working_hours']}. Lunch break: {KNOWLEDGE_BASE['timings']['lunch_break']}."
-        
-        # History & Location
-        if 'established' in query_lower or 'founded' in query_lower or 'started' in query_lower:
-            return f"TKRCET was established in {KNOWLEDGE_BASE['history']['established']} on a {KNOWLEDGE_BASE['history']['campus_size']} campus in {KNOWLEDGE_BASE['history']['location']}."
-        
-        if 'affiliation' in query_lower or 'affiliated' in query_lower:
-            return f"TKRCET is affiliated to {KNOWLEDGE_BASE['history']['affiliation']}."
-        
-        if 'location' in query_lower or 'address' in query_lower or 'where' in query_lower:
-            return f"TKRCET is located at {KNOWLEDGE_BASE['history']['location']}."
-        
-        # Admissions
-        if 'admission' in query_lower or 'apply' in query_lower or 'join' in query_lower:
-            return f"{KNOWLEDGE_BASE['admissions']['process']} Eligibility: {KNOWLEDGE_BASE['admissions']['eligibility']} {KNOWLEDGE_BASE['admissions']['contact']}"
-        
-        # Courses
-        if 'course' in query_lower or 'program' in query_lower or 'branch' in query_lower or 'department' in query_lower:
-            ug = ', '.join(KNOWLEDGE_BASE['courses']['ug'])
-            pg = ', '.join(KNOWLEDGE_BASE['courses']['pg'])
-            return f"TKRCET offers {KNOWLEDGE_BASE['courses']['total']}.\n\nUG Programs: {ug}\n\nPG Programs: {pg}"
-        
-        # Facilities
-        if 'facilit' in query_lower or 'infrastructure' in query_lower or 'amenities' in query_lower:
-            return f"{KNOWLEDGE_BASE['facilities']['main']}\n\nSpecial Features: {KNOWLEDGE_BASE['facilities']['special']}"
+                    return answer
         
-        # Accreditation
-        if 'naac' in query_lower or 'nba' in query_lower or 'accredit' in query_lower or 'approved' in query_lower:
-            return f"TKRCET is {KNOWLEDGE_BASE['accreditation']['naac']} accredited, {KNOWLEDGE_BASE['accreditation']['nba']}, and {KNOWLEDGE_BASE['accreditation']['approvals']}."
+        # Timings, history & location, admissions, courses, facilities, accreditation
+        for topic in ('timings', 'history', 'affiliation', 'location', 'admissions',
+                      'courses', 'facilities', 'accreditation'):
+            if topic in topics:
+                return KB_ANSWERS[topic]
         
         return None
     
-    def _hybrid_retrieve(self, query, top_k=5):
+    @staticmethod
+    def _cache_key(query):
+        """Retrieval ignores case (uncased encoder, lowercased BM25 tokens) and spacing"""
+        return ' '.join(query.lower().split())
+    
+    def _cache_get(self, cache, key):
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+    
+    def _cache_put(self, cache, key, value, max_size):
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > max_size:
+                cache.popitem(last=False)
+    
+    def _hybrid_retrieve(self, query, top_k=5, embedding=None):
         """Hybrid retrieval using FAISS + BM25"""
-        import numpy as np
+        return self._hybrid_retrieve_many([query], top_k, None if embedding is None else [embedding])[0]
+    
+    def _hybrid_retrieve_many(self, queries, top_k=5, embeddings=None):
+        """
+        Hybrid retrieval for several queries: one embedding pass and one FAISS search
+        
+        Repeat queries are answered from the retrieval cache; only the rest
+        are encoded and searched.
+        
+        Args:
+            embeddings: Optional precomputed query embeddings (one per query);
+                        encoded here in a single batch when missing
+        """
+        keys = [(self._cache_key(query), top_k) for query in queries]
+        results = [self._cache_get(self.retrieval_cache, key) for key in keys]
+        missing = [i for i, docs in enumerate(results) if docs is None]
+        if missing:
+            retrieved = self._retrieve_uncached(
+                [queries[i] for i in missing], top_k,
+                None if embeddings is None else [embeddings[i] for i in missing],
+            )
+            for i, docs in zip(missing, retrieved):
+                results[i] = docs
+                self._cache_put(self.retrieval_cache, keys[i], docs, RETRIEVAL_CACHE_SIZE)
+        return results
+    
+    def _retrieve_uncached(self, queries, top_k, embeddings=None):
+        """FAISS + BM25 retrieval behind _hybrid_retrieve_many"""
+        # BM25 keyword search, overlapped with the embedding + FAISS work below
+        # (the scorers and FAISS spend their time in native code)
+        bm25_future = self._bm25_pool.submit(self._bm25_top, queries, top_k * 2)
         
         # FAISS semantic search
-        query_emb = self.embedding_model.encode(query, convert_to_tensor=True)
-        query_np = query_emb.cpu().detach().numpy().astype(np.float32).reshape(1, -1)
+        if embeddings is None or any(emb is None for emb in embeddings):
+            embeddings = self.embedding_model.encode(
+                queries, batch_size=QUERY_ENCODE_BATCH_SIZE, show_progress_bar=False, convert_to_numpy=True
+            )
+        # Own contiguous float32 copy (callers' embeddings are not modified), unit length like the index
+        query_np = np.array(embeddings, dtype=np.float32).reshape(len(queries), -1)
+        faiss.normalize_L2(query_np)
         distances, indices = self.index.search(query_np, top_k * 2)
+        bm25_indices = bm25_future.result()
         
-        faiss_docs = [self.documents[idx] for idx in indices[0] if idx < len(self.documents)]
-        
-        # BM25 keyword search
-        tokenized_query = query.lower().split()
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        top_bm25_indices = np.argsort(bm25_scores)[-top_k*2:][::-1]
-        
-        bm25_docs = [self.documents[idx] for idx in top_bm25_indices if idx < len(self.documents)]
-        
-        # Merge and deduplicate
-        seen_ids = set()
-        merged_docs = []
-        
-        for doc in faiss_docs + bm25_docs:
-            if doc['id'] not in seen_ids:
-                seen_ids.add(doc['id'])
-                merged_docs.append(doc)
-                if len(merged_docs) >= top_k:
-                    break
-        
-        return merged_docs
+        return [
+            self._merge_retrieved(faiss_row, bm25_row, top_k)
+            for faiss_row, bm25_row in zip(indices, bm25_indices)
+        ]
+    
+    def _bm25_top(self, queries, k):
+        """Indices of the (up to) k best BM25 documents for each query, best first; zero scores are dropped"""
+        k = min(k, len(self.documents))
+        if self.bm25_backend == 'bm25s':
+            # One retrieve call scores the whole batch and returns top-k directly
+            query_tokens = bm25s.tokenize(queries, stopwords="en", return_ids=False, show_progress=False)
+            results, scores = self.bm25.retrieve(query_tokens, k=k, show_progress=False)
+            return [row[row_scores > 0] for row, row_scores in zip(results, scores)]
+        
+        top = []
+        for query in queries:
+            bm25_scores = self.bm25.get_scores(query.lower().split())
+            # O(N) selection of the k best in C, then sort only those k
+            candidates = np.argpartition(-bm25_scores, k - 1)[:k]
+            candidates = candidates[bm25_scores[candidates] > 0]
+            top.append(candidates[np.argsort(-bm25_scores[candidates], kind='stable')])
+        return top
+    
+    def _merge_retrieved(self, faiss_indices, top_bm25_indices, top_k):
+        """Combine one query's FAISS hits with its BM25 hits (FAISS first, deduplicated by doc id)"""
+        num_docs = len(self.documents)
+        faiss_indices = np.asarray(faiss_indices, dtype=np.int64)
+        top_bm25_indices = np.asarray(top_bm25_indices, dtype=np.int64)
+        candidates = np.concatenate((
+            faiss_indices[(faiss_indices >= 0) & (faiss_indices < num_docs)],  # Approximate indexes pad misses with -1
+            top_bm25_indices[top_bm25_indices < num_docs],
+        ))
+        
+        # First occurrence of each doc id, kept in candidate order
+        _, first = np.unique(self._dedup_key[candidates], return_index=True)
+        keep = candidates[np.sort(first)[:top_k]]
+        
+        return [self.documents[idx] for idx in keep]
     
     def _extract_relevant_links(self, docs):
         """Extract unique, relevant URLs from retrieved documents"""
@@ -364,26 +608,29 @@ class UltraRAGSystem:
         seen_urls = set()
         
         for doc in docs[:5]:  # Check top 5 docs
-            url = doc.get('metadata', {}).get('url', '')
-            source = doc.get('metadata', {}).get('source', '')
-            
-            # Prefer source over url field
-            link = source if source and source.startswith('http') else url
+            link = doc['link']  # Precomputed in _load_corpus
             
-            if link and link not in seen_urls and link.startswith('http'):
+            if link and link not in seen_urls:
                 seen_urls.add(link)
                 links.append(link)
         
         return links[:3]  # Return max 3 links
     
-    def _generate_response(self, query, docs):
-        """Generate response using Ollama with retrieved context"""
+    def _format_links(self, docs):
+        """Related-links footer for an answer (empty string if there are none)"""
+        links = self._extract_relevant_links(docs)
+        if not links:
+            return ""
+        return "\n\n📌 Related Links:\n" + "".join(f"• {link}\n" for link in links)
+    
+    def _build_prompt(self, query, docs):
+        """Build the Ollama prompt; returns (prompt, document context)"""
         
         # Build context from retrieved documents
-        context = "\n\n".join([f"• {doc['contents'][:400]}" for doc in docs[:3]])
+        context = "\n\n".join(doc['bullet'] for doc in docs[:3])
         
-        # Build KB context
-        kb_context = self._format_kb_context()
+        # KB context (formatted once at import)
+        kb_context = KB_CONTEXT
         
         prompt = f"""You are the TKRCET College Assistant chatbot. You ONLY answer questions about TKRCET college.
 
@@ -411,83 +658,210 @@ If the question is NOT about TKRCET college, respond with: "I'm sorry, I can onl
 
 Your Answer:"""
         
+        return prompt, context
+    
+    def _generate_response(self, query, docs, short_answer=False):
+        """Generate response using Ollama with retrieved context; returns (response, complete)"""
+        status = {}
+        response = "".join(self._generate_response_stream(query, docs, short_answer, status))
+        return response, status['complete']
+    
+    @staticmethod
+    def _ends_sentence(tail):
+        """Whether answer text ending in `tail` ends on a sentence terminator (not 'Dr.', 'B.Tech.', '8.')"""
+        return tail.endswith(('.', '!', '?')) and not _NOT_SENTENCE_END_RE.search(tail)
+    
+    def _generate_response_stream(self, query, docs, short_answer=False, status=None):
+        """
+        Streaming variant of _generate_response: yields answer text as
+        Ollama produces it, then the links footer.
+        
+        Nothing is emitted until the answer passes the same 10-character
+        minimum, so an empty/failed generation still yields the snippet fallback.
+        With short_answer, once the answer passes ANSWER_SOFT_LIMIT characters
+        generation stops at the next sentence end (a terminator followed by
+        whitespace) and the connection is closed to free the Ollama slot.
+        Otherwise the answer runs to num_predict.
+        
+        When given, status['complete'] is set once the stream is exhausted:
+        True only if Ollama finished the answer (or the short-answer stop was
+        reached), False for the snippet fallback or an answer cut off by an error.
+        """
+        prompt, context = self._build_prompt(query, docs)
+        
+        emitted = False
+        length = 0
+        tail = ""  # Last few characters yielded, for sentence-end checks
+        at_sentence_end = False  # Short answer is long enough and the last token ended a sentence
+        finished = False  # Ollama reported done (or the short answer stopped early)
+        pending = ""  # Text not yet yielded (leading/trailing whitespace is held back)
         try:
-            response = requests.post(
+            response = self._session.post(
                 self.ollama_url,
                 json={
                     "model": self.ollama_model,
                     "prompt": prompt,
-                    "stream": False,
+                    "stream": True,
                     "options": {
-                        "temperature": 0.1,  # Lower for faster, more deterministic responses
-                        "num_predict": 150,  # Reduced from 250 for faster generation
-                        "num_ctx": 1024      # Reduced from 2048 for 40% speed boost
+                        "temperature": 0.1,
+                        "num_predict": 150,
+                        "num_ctx": 1024
                     }
                 },
+                stream=True,
                 timeout=60
             )
-            if response.status_code == 200:
-                answer = response.json().get('response', '').strip()
-                if answer and len(answer) > 10:
-                    # Add relevant navigation links
-                    links = self._extract_relevant_links(docs)
-                    if links:
-                        answer += "\n\n📌 Related Links:\n"
-                        for link in links:
-                            answer += f"• {link}\n"
-                    return answer
+            with response:
+                if response.status_code == 200:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        piece = chunk.get('response', '')
+                        if at_sentence_end and piece[:1].isspace():
+                            finished = True
+                            break  # The terminator was followed by whitespace: a real sentence end
+                        if piece:
+                            at_sentence_end = False
+                        pending += piece
+                        if not emitted:
+                            pending = pending.lstrip()
+                            emitted = len(pending.rstrip()) > 10
+                        if emitted:
+                            text = pending.rstrip()
+                            if text:
+                                yield text
+                                pending = pending[len(text):]
+                                length += len(text)
+                                tail = (tail + text)[-16:]
+                                at_sentence_end = (
+                                    short_answer and length > ANSWER_SOFT_LIMIT and self._ends_sentence(tail)
+                                )
+                        if chunk.get('done'):
+                            finished = True
+                            break
         except Exception as e:
             print(f"⚠ Ollama error: {e}")
         
-        # Fallback to document snippets with links
-        fallback = f"Here's what I found:\n\n{context}"
-        links = self._extract_relevant_links(docs)
-        if links:
-            fallback += "\n\n📌 Related Links:\n"
-            for link in links:
-                fallback += f"• {link}\n"
-        return fallback
-    
-    def _format_kb_context(self):
-        """Format knowledge base as context"""
-        kb = KNOWLEDGE_BASE
-        lines = []
-        
-        lines.append(f"Principal: {kb['personnel']['principal']}")
-        lines.append(f"Vice Principal: {kb['personnel']['vice_principal']}")
-        lines.append(f"Timings: {kb['timings']['working_hours']}")
-        lines.append(f"Established: {kb['history']['established']}")
-        lines.append(f"Affiliation: {kb['history']['affiliation']}")
-        
-        return "\n".join(lines)
-    
-    def __call__(self, query):
-        """Main entry point for queries"""
-        query = query.strip()
+        if status is not None:
+            status['complete'] = emitted and finished
+        if emitted:
+            yield self._format_links(docs)
+        else:
+            # Fallback to document snippets with links
+            yield f"{SNIPPET_FALLBACK_PREFIX}\n\n{context}" + self._format_links(docs)
+    
+    def _precheck(self, query):
+        """Answers that need no retrieval (empty/greeting/out of scope/KB), else None"""
         if not query:
             return "Please enter a question."
         
+        # Lowercase once; the checks below share it
+        query_lower = query.lower()
+        
         # Greetings
-        greetings = ['hi', 'hello', 'hey', 'how are you', 'how r u', 'how are u', 'whats up', "what's up"]
-        if any(greeting == query.lower() for greeting in greetings):
+        if query_lower in GREETINGS:
             return "Hello! I'm TKRCET College Assistant. How can I help you today? 😊"
         
         # Check if query is college-related
-        if not self._is_college_related(query):
+        if not self._is_college_related(query_lower):
             return "I'm sorry, I can only answer questions about TKRCET college. Please ask me about admissions, courses, facilities, timings, faculty, or other college-related topics."
         
         # Check knowledge base first
-        kb_answer = self._check_knowledge_base(query)
+        kb_answer = self._check_knowledge_base(query_lower)
         if kb_answer:
             return kb_answer
         
+        return None
+    
+    def _remember_response(self, key, response, complete):
+        """
+        Cache generated answers that Ollama finished; snippet fallbacks (Ollama
+        down) and answers cut off by an error are retried next time
+        """
+        if complete:
+            self._cache_put(self.response_cache, key, response, RESPONSE_CACHE_SIZE)
+    
+    def __call__(self, query, embedding=None, short_answer=False):
+        """
+        Main entry point for queries
+        
+        Args:
+            embedding: Optional precomputed query embedding (skips re-encoding)
+            short_answer: Stop at the first sentence end past ANSWER_SOFT_LIMIT
+                characters (not cached, so full answers are never truncated)
+        """
+        query = query.strip()
+        answer = self._precheck(query)
+        if answer is not None:
+            return answer
+        
+        key = self._cache_key(query)
+        cached = self._cache_get(self.response_cache, key)
+        if cached is not None:
+            return cached
+        
         # Retrieve relevant documents
-        docs = self._hybrid_retrieve(query, top_k=5)
+        docs = self._hybrid_retrieve(query, top_k=5, embedding=embedding)
         
         # Generate response
-        response = self._generate_response(query, docs)
+        response, complete = self._generate_response(query, docs, short_answer)
+        if not short_answer:
+            self._remember_response(key, response, complete)
         
         return response
+    
+    def stream(self, query, embedding=None, short_answer=False):
+        """Like __call__, but yields the answer in chunks as it is generated"""
+        query = query.strip()
+        answer = self._precheck(query)
+        if answer is not None:
+            yield answer
+            return
+        
+        key = self._cache_key(query)
+        cached = self._cache_get(self.response_cache, key)
+        if cached is not None:
+            yield cached
+            return
+        
+        docs = self._hybrid_retrieve(query, top_k=5, embedding=embedding)
+        parts = []
+        status = {}
+        for chunk in self._generate_response_stream(query, docs, short_answer, status):
+            parts.append(chunk)
+            yield chunk
+        if not short_answer:
+            self._remember_response(key, "".join(parts), status['complete'])
+    
+    def batch(self, queries, max_workers=4, embeddings=None):
+        """
+        Answer several queries at once
+        
+        Retrieval shares one embedding pass and one FAISS search; the
+        Ollama calls run concurrently. Answers are in input order.
+        Precomputed query embeddings (one per query) skip the encode.
+        """
+        queries = [query.strip() for query in queries]
+        answers = [self._precheck(query) for query in queries]
+        for i, answer in enumerate(answers):
+            if answer is None:
+                answers[i] = self._cache_get(self.response_cache, self._cache_key(queries[i]))
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            return answers
+        
+        texts = [queries[i] for i in pending]
+        docs_per_query = self._hybrid_retrieve_many(
+            texts, top_k=5, embeddings=None if embeddings is None else [embeddings[i] for i in pending]
+        )
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+            for i, (answer, complete) in zip(pending, pool.map(self._generate_response, texts, docs_per_query)):
+                answers[i] = answer
+                self._remember_response(self._cache_key(queries[i]), answer, complete)
+        
+        return answers
 
 
 if __name__ == '__main__':
@@ -3,11 +3,13 @@ Backend Server for College Chatbot
 Handles API requests from the frontend
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from app.services.agent_mcp import SimplifiedMCPAgent
 import os
+import json
 import logging
+import threading
 
 # Configure logging
 logging.basicConfig(
@@ -22,18 +24,39 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Global agent instance
+# Optional: serialize API responses with orjson (falls back to Flask's stdlib json)
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+
+    class ORJSONProvider(DefaultJSONProvider):
+        """Flask JSON provider backed by orjson"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+except ImportError:
+    pass
+
+# Global agent instance (built at server startup; lazily if imported by a WSGI server)
 agent = None
+_agent_lock = threading.Lock()  # Concurrent first requests build only one agent
 
 def get_agent():
     global agent
     if agent is None:
-        try:
-            print("Initializing Chatbot Agent...")
-            agent = SimplifiedMCPAgent()
-            print("Chatbot agent initialized successfully")
-        except Exception as e:
-            print(f"Error initializing chatbot agent: {str(e)}")
+        with _agent_lock:
+            if agent is None:
+                try:
+                    print("Initializing Chatbot Agent...")
+                    agent = SimplifiedMCPAgent()
+                    print("Chatbot agent initialized successfully")
+                except Exception as e:
+                    print(f"Error initializing chatbot agent: {str(e)}")
     return agent
 
 @app.route('/query', methods=['POST'])
@@ -65,6 +88,33 @@ def query():
         print(f"Error processing query: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/query/stream', methods=['POST'])
+def query_stream():
+    """Handle chat queries, streaming the answer as server-sent events"""
+    data = request.json or {}
+    message = data.get('message')
+    session_id = data.get('session_id')
+    
+    if not message:
+        return jsonify({'error': 'Message required'}), 400
+    
+    chatbot = get_agent()
+    if not chatbot:
+        return jsonify({'error': 'Chatbot system not initialized'}), 500
+    
+    def events():
+        # One 'data' event per chunk, then 'done' (or 'error') to close
+        try:
+            for chunk in chatbot.stream(message):
+                yield f"data: {json.dumps({'token': chunk})}\n\n"
+        except Exception as e:
+            print(f"Error processing query: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'session_id': session_id or 'new_session'})}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream')
+
 @app.route('/health')
 def health():
     """Health check endpoint"""
@@ -75,6 +125,9 @@ if __name__ == '__main__':
     print("TKRCET Chatbot Backend Server")
     print("=" * 70)
     print("\nStarting server...")
+    
+    # Load models and indexes now, so the first query doesn't wait for them
+    get_agent()
     print("API Endpoint: http://localhost:8000/query")
     print("\nPress Ctrl+C to stop")
     print("=" * 70)